@@ -0,0 +1,210 @@
+# ajuste_hiperparametros.py
+import os
+import json
+import math
+import time
+import pickle
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+
+from datos import cargar_dataset, etiquetas, columnas_utiles, RUTA_CSV
+from codificador import CodificadorCategorico
+from bosque_plano import BosquePlano
+from utils_model import cargar_config, CLAVES_MODELO, RUTA_CONFIG
+from instrumentacion import medir, perfil_desde_entorno
+from memoria_compartida import compartir, liberar, iniciar_trabajador, matrices
+
+# Rejilla por defecto: del bosque completo actual a variantes más pequeñas y rápidas
+REJILLA_POR_DEFECTO = {
+    "n_estimators": [25, 50, 100],
+    "max_depth": [None, 20, 12],
+    "min_samples_leaf": [1, 5],
+}
+REPETICIONES_LATENCIA = 50
+
+
+def candidatos_rejilla(rejilla):
+    """Producto cartesiano de la rejilla: lista de dicts de hiperparámetros."""
+    desconocidas = set(rejilla) - set(CLAVES_MODELO)
+    if desconocidas:
+        raise ValueError(f"Hiperparámetros desconocidos en la rejilla: {sorted(desconocidas)}")
+    if "random_state" in rejilla:
+        raise ValueError("La rejilla no puede incluir 'random_state': la semilla es la de la configuración.")
+    claves = sorted(rejilla)
+    return [dict(zip(claves, valores)) for valores in itertools.product(*(rejilla[c] for c in claves))]
+
+
+def _latencia_fila_ms(model, fila):
+    plano = BosquePlano.desde_modelo(model)
+    tiempos = []
+    for _ in range(REPETICIONES_LATENCIA):
+        inicio = time.perf_counter()
+        plano.predecir_proba(fila)
+        tiempos.append(time.perf_counter() - inicio)
+    return float(np.median(tiempos) * 1000)
+
+
+def evaluar_pliegue(indice, hp, random_state, entrenamiento, validacion, medir_coste):
+    """Entrena un candidato en un pliegue (en un proceso de trabajo) y devuelve sus métricas.
+
+    El tamaño y la latencia de una fila solo se miden si medir_coste (un
+    pliegue por candidato basta: no dependen de qué filas se validan).
+    """
+    X, y = matrices()
+    model = RandomForestClassifier(**dict(hp, random_state=random_state, n_jobs=1))
+    model.fit(X[entrenamiento], y[entrenamiento])
+    proba = model.predict_proba(X[validacion])[:, list(model.classes_).index(1)]
+    resultado = {"indice": indice, "auc": float(roc_auc_score(y[validacion], proba))}
+    if medir_coste:
+        resultado["mb"] = len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)) / 1e6
+        resultado["ms_fila"] = _latencia_fila_ms(model, X[validacion[:1]])
+    return resultado
+
+
+def _evaluar_ronda(pool, candidatos, y, filas, k, random_state):
+    """k-fold estratificado de todos los candidatos sobre `filas`; devuelve una lista de resúmenes."""
+    pliegues = list(StratifiedKFold(k, shuffle=True, random_state=random_state).split(filas, y[filas]))
+    futuros = [pool.submit(evaluar_pliegue, i, hp, random_state, filas[ent], filas[val], p == 0)
+               for i, hp in enumerate(candidatos) for p, (ent, val) in enumerate(pliegues)]
+    por_candidato = [[] for _ in candidatos]
+    for futuro in futuros:
+        r = futuro.result()
+        por_candidato[r["indice"]].append(r)
+
+    resumenes = []
+    for hp, resultados in zip(candidatos, por_candidato):
+        aucs = [r["auc"] for r in resultados]
+        coste = next(r for r in resultados if "mb" in r)
+        resumenes.append({"hiperparametros": hp, "filas": len(filas), "auc": round(float(np.mean(aucs)), 5),
+                          "auc_std": round(float(np.std(aucs)), 5), "mb": round(coste["mb"], 3),
+                          "ms_fila": round(coste["ms_fila"], 4)})
+    return resumenes
+
+
+def frente_pareto(resultados):
+    """Resultados no dominados en (AUC más alto, tamaño menor, latencia menor)."""
+    def domina(a, b):
+        mejor_o_igual = a["auc"] >= b["auc"] and a["mb"] <= b["mb"] and a["ms_fila"] <= b["ms_fila"]
+        estricto = a["auc"] > b["auc"] or a["mb"] < b["mb"] or a["ms_fila"] < b["ms_fila"]
+        return mejor_o_igual and estricto
+    return [r for r in resultados if not any(domina(otro, r) for otro in resultados)]
+
+
+def elegir(frente, max_ms_fila=None, max_mb=None):
+    """Del frente de Pareto, el de mayor AUC que cumpla los límites de latencia y tamaño."""
+    validos = [r for r in frente if (max_ms_fila is None or r["ms_fila"] <= max_ms_fila)
+               and (max_mb is None or r["mb"] <= max_mb)]
+    if not validos:
+        raise ValueError("Ningún candidato del frente de Pareto cumple los límites de latencia y tamaño.")
+    return max(validos, key=lambda r: (r["auc"], -r["ms_fila"]))
+
+
+def buscar(csv_path=RUTA_CSV, rejilla=None, estrategia="rejilla", k=3, procesos=None, factor=3,
+           random_state=42):
+    """Búsqueda con validación cruzada k-fold repartida entre procesos.
+
+    estrategia="rejilla" evalúa todos los candidatos con todas las filas;
+    "mitades" (successive halving) los evalúa primero con una fracción de las
+    filas y en cada ronda conserva 1/factor de ellos con el triple de filas
+    (con factor=3), hasta usar el dataset completo.
+
+    La matriz codificada se copia una sola vez a memoria compartida y todos
+    los procesos la leen sin copiarla. Devuelve la lista de resúmenes de la
+    última ronda (AUC media y desviación, MB del modelo y ms por fila).
+    """
+    candidatos = candidatos_rejilla(rejilla or REJILLA_POR_DEFECTO)
+    with medir("ajuste_cargar_codificar"):
+        df = cargar_dataset(csv_path)
+        y = etiquetas(df).to_numpy()
+        X = CodificadorCategorico.ajustar(df[columnas_utiles]).transformar(df[columnas_utiles])
+        X = np.ascontiguousarray(X.to_numpy(dtype=np.float32))
+
+    if estrategia == "rejilla":
+        rondas = 1
+    elif estrategia == "mitades":
+        rondas = max(1, math.ceil(math.log(len(candidatos), factor)))
+    else:
+        raise ValueError(f"Estrategia desconocida: {estrategia} (use 'rejilla' o 'mitades')")
+
+    # Orden aleatorio fijo: los prefijos son submuestras representativas
+    orden = np.random.default_rng(random_state).permutation(len(y))
+    memoria_X, descriptor_X = compartir(X)
+    memoria_y, descriptor_y = compartir(y)
+    del X
+    try:
+        with ProcessPoolExecutor(max_workers=procesos or os.cpu_count(), initializer=iniciar_trabajador,
+                                 initargs=(descriptor_X, descriptor_y)) as pool:
+            for ronda in range(rondas):
+                n_filas = len(y) if ronda == rondas - 1 else max(k * 50, len(y) // factor ** (rondas - 1 - ronda))
+                print(f"🔎 Ronda {ronda + 1}/{rondas}: {len(candidatos)} candidato(s) x {k} pliegues, "
+                      f"{n_filas:,} filas")
+                with medir("ajuste_ronda", ronda=ronda + 1, candidatos=len(candidatos), filas=n_filas):
+                    resultados = _evaluar_ronda(pool, candidatos, y, np.sort(orden[:n_filas]), k, random_state)
+                if ronda < rondas - 1:
+                    resultados.sort(key=lambda r: r["auc"], reverse=True)
+                    candidatos = [r["hiperparametros"] for r in resultados[:max(1, math.ceil(len(resultados) / factor))]]
+    finally:
+        liberar(memoria_X, memoria_y)
+    return resultados
+
+
+def _leer_rejilla(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Búsqueda de hiperparámetros con validación cruzada en paralelo.")
+    parser.add_argument("--csv", default=RUTA_CSV)
+    parser.add_argument("--rejilla", help="JSON con listas de valores por hiperparámetro")
+    parser.add_argument("--estrategia", choices=["rejilla", "mitades"], default="rejilla")
+    parser.add_argument("--pliegues", type=int, default=3)
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos de trabajo (por defecto, uno por núcleo)")
+    parser.add_argument("--factor", type=int, default=3, help="Reducción por ronda en la estrategia 'mitades'")
+    parser.add_argument("--max-ms-fila", type=float, help="Latencia máxima por fila del modelo elegido")
+    parser.add_argument("--max-mb", type=float, help="Tamaño máximo del modelo elegido")
+    parser.add_argument("--salida", default="ajuste_hiperparametros.json")
+    parser.add_argument("--sin-guardar", action="store_true", help="Solo informa; no entrena el modelo elegido")
+    args = parser.parse_args()
+    perfil_desde_entorno("ajuste_hiperparametros")
+
+    config = cargar_config(RUTA_CONFIG)
+    rejilla = _leer_rejilla(args.rejilla) if args.rejilla else None
+    resultados = buscar(args.csv, rejilla, args.estrategia, args.pliegues, args.procesos, args.factor,
+                        config["random_state"])
+    frente = frente_pareto(resultados)
+
+    print(f"\n{'hiperparámetros':<66} {'AUC':>7} {'±':>6} {'MB':>8} {'ms/fila':>8}")
+    for r in sorted(resultados, key=lambda r: r["auc"], reverse=True):
+        marca = "⭐" if r in frente else "  "
+        print(f"{marca}{json.dumps(r['hiperparametros']):<64} {r['auc']:>7.4f} {r['auc_std']:>6.4f} "
+              f"{r['mb']:>8.2f} {r['ms_fila']:>8.3f}")
+
+    elegido = elegir(frente, args.max_ms_fila, args.max_mb)
+    print(f"\n🏆 Elegido del frente de Pareto: {json.dumps(elegido['hiperparametros'])}")
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump({"estrategia": args.estrategia, "pliegues": args.pliegues, "resultados": resultados,
+                   "frente_pareto": frente, "elegido": elegido}, f, indent=2)
+    print(f"✅ Resultados en {args.salida}")
+
+    if args.sin_guardar:
+        return
+    import registro_modelos
+    from almacen_modelos import guardar_metadatos
+    config.update(elegido["hiperparametros"])
+    modelo_id = registro_modelos.entrenar(args.csv, config=config)
+    metadatos = registro_modelos.leer_metadatos(modelo_id)
+    metadatos["ajuste"] = {"estrategia": args.estrategia, "pliegues": args.pliegues, "auc_cv": elegido["auc"],
+                           "auc_cv_std": elegido["auc_std"], "mb": elegido["mb"], "ms_fila": elegido["ms_fila"]}
+    guardar_metadatos(modelo_id, metadatos)
+    print(f"✅ Modelo {modelo_id} entrenado con esos hiperparámetros y marcado como actual")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# almacen_modelos.py
+import os
+import re
+import json
+import shutil
+
+import joblib
+
+DIR_MODELOS = "models"
+DIR_ENCODERS = "encoders"
+
+# "comprimido": joblib con compresión zlib (archivos pequeños, carga algo más lenta).
+# "sin_comprimir": archivos más grandes que se cargan más rápido. Para compartir
+# las páginas del modelo entre procesos está el bosque aplanado (bosque_plano.py).
+FORMATOS = ("comprimido", "sin_comprimir")
+NIVEL_COMPRESION = 3
+
+_patron_id = re.compile(r"^(?:model|encoder|\.reserva)_(\d+)\.")
+
+
+def ruta_modelo(modelo_id):
+    return os.path.join(DIR_MODELOS, f"model_{modelo_id}.pkl")
+
+
+def ruta_metadatos(modelo_id):
+    return os.path.join(DIR_MODELOS, f"model_{modelo_id}.json")
+
+
+def ruta_plano(modelo_id):
+    """Directorio con el bosque aplanado en .npy (ver bosque_plano.py)."""
+    return os.path.join(DIR_MODELOS, f"model_{modelo_id}_plano")
+
+
+def ruta_encoder(modelo_id):
+    """Ruta del encoder: JSON si existe, o el pickle de LabelEncoders de los modelos antiguos."""
+    ruta_json = os.path.join(DIR_ENCODERS, f"encoder_{modelo_id}.json")
+    ruta_pkl = os.path.join(DIR_ENCODERS, f"encoder_{modelo_id}.pkl")
+    if not os.path.exists(ruta_json) and os.path.exists(ruta_pkl):
+        return ruta_pkl
+    return ruta_json
+
+
+def _ruta_reserva(modelo_id):
+    return os.path.join(DIR_MODELOS, f".reserva_{modelo_id}.lock")
+
+
+def listar_modelos():
+    """Devuelve los ids de los modelos guardados, ordenados de menor a mayor."""
+    if not os.path.isdir(DIR_MODELOS):
+        return []
+    ids = []
+    for f in os.listdir(DIR_MODELOS):
+        if f.startswith("model_") and f.endswith(".pkl"):
+            try:
+                ids.append(int(f[len("model_"):-len(".pkl")]))
+            except ValueError:
+                continue
+    return sorted(ids)
+
+
+def leer_metadatos(modelo_id):
+    """Metadatos guardados junto al modelo, o None para los modelos antiguos que no los tienen."""
+    try:
+        with open(ruta_metadatos(modelo_id), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def guardar_metadatos(modelo_id, metadatos):
+    tmp = ruta_metadatos(modelo_id) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(metadatos, f, indent=2)
+    os.replace(tmp, ruta_metadatos(modelo_id))
+
+
+def reservar_id():
+    """Reserva de forma atómica un id nuevo y lo devuelve.
+
+    La reserva es un archivo creado con O_EXCL, así que dos procesos que
+    entrenan a la vez nunca obtienen el mismo id. Se consideran usados los ids
+    de modelos, encoders (incluidos los pickles antiguos sin modelo) y reservas.
+    """
+    os.makedirs(DIR_MODELOS, exist_ok=True)
+    usados = [0]
+    for directorio in (DIR_MODELOS, DIR_ENCODERS):
+        if os.path.isdir(directorio):
+            for f in os.listdir(directorio):
+                m = _patron_id.match(f)
+                if m:
+                    usados.append(int(m.group(1)))
+
+    modelo_id = max(usados) + 1
+    while True:
+        try:
+            os.close(os.open(_ruta_reserva(modelo_id), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return modelo_id
+        except FileExistsError:
+            modelo_id += 1
+
+
+def liberar_id(modelo_id):
+    """Quita la reserva de un id (tras guardar el modelo o si el entrenamiento falló)."""
+    try:
+        os.remove(_ruta_reserva(modelo_id))
+    except FileNotFoundError:
+        pass
+
+
+def guardar_modelo(model, modelo_id, formato="comprimido"):
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de modelo desconocido: '{formato}'. Use uno de {FORMATOS}.")
+    os.makedirs(DIR_MODELOS, exist_ok=True)
+    destino = ruta_modelo(modelo_id)
+    tmp = destino + ".tmp"
+    joblib.dump(model, tmp, compress=NIVEL_COMPRESION if formato == "comprimido" else 0)
+    os.replace(tmp, destino)
+
+
+def cargar_modelo(modelo_id):
+    """Carga un modelo guardado (comprimido o no; joblib lo detecta)."""
+    return joblib.load(ruta_modelo(modelo_id))
+
+
+def eliminar_modelo(modelo_id):
+    """Borra el modelo, sus metadatos, su versión aplanada y su encoder (JSON o pickle)."""
+    rutas = [ruta_modelo(modelo_id), ruta_metadatos(modelo_id),
+             os.path.join(DIR_ENCODERS, f"encoder_{modelo_id}.json"),
+             os.path.join(DIR_ENCODERS, f"encoder_{modelo_id}.pkl")]
+    for ruta in rutas:
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+    shutil.rmtree(ruta_plano(modelo_id), ignore_errors=True)
+
+
+def validar_retencion(ultimos=None, mejores=None):
+    for nombre, valor in (("ultimos", ultimos), ("mejores", mejores)):
+        if valor is not None and valor < 1:
+            raise ValueError(f"La retención '{nombre}' debe ser al menos 1 (o None para no aplicarla): {valor}")
+
+
+def aplicar_retencion(ultimos=None, mejores=None, conservar=()):
+    """Borra los pares modelo/encoder que no entran en la política de retención.
+
+    Se conservan los `ultimos` ids más recientes, los `mejores` modelos por
+    AUC de validación (de sus metadatos) y los ids de `conservar`. Si no se
+    indica ni `ultimos` ni `mejores` no se borra nada. Devuelve los ids borrados.
+    """
+    if ultimos is None and mejores is None:
+        return []
+    validar_retencion(ultimos, mejores)
+    ids = listar_modelos()
+    mantener = set(conservar)
+    if ultimos is not None:
+        mantener.update(ids[-ultimos:])
+    if mejores is not None:
+        con_auc = []
+        for modelo_id in ids:
+            auc = (leer_metadatos(modelo_id) or {}).get("auc_validacion")
+            if auc is not None:
+                con_auc.append((auc, modelo_id))
+        mantener.update(modelo_id for _, modelo_id in sorted(con_auc, reverse=True)[:mejores])
+
+    borrados = [modelo_id for modelo_id in ids if modelo_id not in mantener]
+    for modelo_id in borrados:
+        eliminar_modelo(modelo_id)
+    return borrados
@@ -1,70 +1,214 @@
 import os
-import joblib
-import pandas as pd
-import matplotlib.pyplot as plt
-from sklearn.metrics import confusion_matrix, ConfusionMatrixDisplay, roc_curve, auc
+import argparse
 import numpy as np
+from sklearn.metrics import confusion_matrix, roc_curve, auc
+from datos import cargar_dataset, leer_por_bloques, etiquetas, columnas_utiles, RUTA_CSV
+from ensamble import Ensamble, MODOS, combinar
+import cache_probabilidades
+import registro_modelos
+from instrumentacion import medir, contar, contadores, perfil_desde_entorno
 
-# Cargar el dataset
-df = pd.read_csv("data/Airline_customer_satisfaction.csv")
-y_true = df["satisfaction"].apply(lambda x: 1 if x == "satisfied" else 0)
-
-columnas_utiles = ["Age", "Type of Travel", "Class", "Flight Distance", 
-                   "Inflight entertainment", "On-board service", "Cleanliness", 
-                   "Arrival Delay in Minutes", "Departure Delay in Minutes"]
-
-# Preparar X original
-X_original = df[columnas_utiles].copy()
-
-# Acumuladores de probabilidades
-acumulador_proba = np.zeros(len(df))
-
-# Contador de modelos válidos
-n_modelos = 0
-
-for model_file in os.listdir("models"):
-    model_id = model_file.split("_")[1].split(".")[0]
-    try:
-        model = joblib.load(f"models/{model_file}")
-        encoders = joblib.load(f"encoders/encoder_{model_id}.pkl")
-
-        X = X_original.copy()
-        for col in X.select_dtypes(include='object').columns:
-            le = encoders.get(col)
-            if le:
-                X[col] = le.transform(X[col])
-
-        y_prob = model.predict_proba(X)[:, 1]
-        acumulador_proba += y_prob
-        n_modelos += 1
-
-    except Exception as e:
-        print(f"❌ Error al procesar modelo {model_id}: {e}")
-
-if n_modelos == 0:
-    raise ValueError("No se pudo cargar ningún modelo correctamente.")
-
-# Promediar las probabilidades
-prob_final = acumulador_proba / n_modelos
-y_pred_final = (prob_final >= 0.5).astype(int)
-
-# 📊 Matriz de confusión
-cm = confusion_matrix(y_true, y_pred_final)
-disp = ConfusionMatrixDisplay(confusion_matrix=cm)
-disp.plot()
-plt.title("Matriz de Confusión acumulada (promedio de modelos)")
-plt.show()
-
-# 📈 Curva ROC
-fpr, tpr, _ = roc_curve(y_true, prob_final)
-roc_auc = auc(fpr, tpr)
-
-plt.figure()
-plt.plot(fpr, tpr, label=f"AUC promedio = {roc_auc:.2f}", color='darkorange')
-plt.plot([0, 1], [0, 1], linestyle='--', color='gray')
-plt.xlabel('FPR')
-plt.ylabel('TPR')
-plt.title('Curva ROC (promedio de todos los entrenamientos)')
-plt.legend(loc="lower right")
-plt.grid()
-plt.show()
+# Intervalos del histograma de probabilidades del modo streaming (memoria fija:
+# dos vectores de N_INTERVALOS + 1 enteros, ~1.6 MB, sea cual sea el número de filas)
+N_INTERVALOS = 100_000
+
+
+def probabilidades_con_cache(ids, df, csv_path, hilos, usar_cache=True):
+    """Probabilidades float32 por modelo, (n_modelos, n_filas), reutilizando la caché.
+
+    Solo se cargan y evalúan los modelos sin vector guardado para su clave
+    (hash del modelo, hash del encoder, huella del dataset). Devuelve
+    (ids_validos, probas): se omiten los modelos que no se pudieron cargar.
+    """
+    with medir("leer_cache_probabilidades", modelos=len(ids)):
+        claves = cache_probabilidades.claves(ids, csv_path) if usar_cache else {}
+        vectores = {}
+        for modelo_id, clave in claves.items():
+            vector = cache_probabilidades.leer(clave)
+            if vector is not None and len(vector) == len(df):
+                vectores[modelo_id] = vector
+
+    pendientes = [modelo_id for modelo_id in ids if modelo_id not in vectores]
+    contar("cache_probabilidades_aciertos", len(vectores))
+    contar("cache_probabilidades_fallos", len(pendientes))
+    print(f"🗃️ {len(vectores)} modelo(s) desde caché, {len(pendientes)} por evaluar")
+    if pendientes:
+        with medir("cargar_modelos", modelos=len(pendientes)):
+            ensamble = Ensamble.desde_registro(pendientes)
+        print(f"🤖 {len(ensamble.miembros)} modelos, {ensamble.n_grupos_encoders} juego(s) de encoders distintos")
+        with medir("predecir_modelos", modelos=len(ensamble.miembros), filas=len(df)):
+            calculadas = ensamble.predecir_proba_miembros(df[columnas_utiles], hilos).astype(np.float32)
+        for modelo_id, vector in zip(ensamble.ids, calculadas):
+            vectores[modelo_id] = vector
+            if usar_cache:
+                cache_probabilidades.guardar(claves[modelo_id], vector)
+
+    if usar_cache:
+        cache_probabilidades.limpiar(claves.values())
+    validos = [modelo_id for modelo_id in ids if modelo_id in vectores]
+    if not validos:
+        raise ValueError("No se pudo cargar ningún modelo correctamente.")
+    return validos, np.stack([vectores[modelo_id] for modelo_id in validos])
+
+
+def evaluar_en_memoria(csv_path, modo, hilos, pesos=None, usar_cache=True):
+    """Carga todo el dataset y devuelve (matriz_confusion, fpr, tpr)."""
+    ids = registro_modelos.listar_modelos()
+    if pesos is not None and len(pesos) != len(ids):
+        raise ValueError(f"Debe haber un peso por cada modelo del ensamble ({len(pesos)} pesos, {len(ids)} modelos).")
+    with medir("cargar_dataset"):
+        df = cargar_dataset(csv_path)
+        y_true = etiquetas(df)
+
+    validos, probas = probabilidades_con_cache(ids, df, csv_path, hilos, usar_cache)
+    if pesos is not None:
+        pesos = [peso for modelo_id, peso in zip(ids, pesos) if modelo_id in validos]
+
+    # Combinar las probabilidades de todos los modelos
+    with medir("metricas", modo=modo):
+        prob_final = combinar(probas.astype(np.float64), modo, pesos)
+        y_pred_final = (prob_final >= 0.5).astype(int)
+
+        cm = confusion_matrix(y_true, y_pred_final, labels=[0, 1])
+        fpr, tpr, _ = roc_curve(y_true, prob_final)
+    return cm, fpr, tpr
+
+
+def evaluar_streaming(ensamble, csv_path, modo, hilos, chunksize):
+    """Evalúa por bloques con memoria acotada y devuelve (matriz_confusion, fpr, tpr).
+
+    Por bloque solo se acumulan los conteos de la matriz de confusión y un
+    histograma de probabilidades por clase real, de tamaño fijo (ver
+    intervalos_histograma); la curva ROC se reconstruye al final a partir de
+    los histogramas. La matriz de confusión es exacta. El AUC solo se aproxima
+    en los pares positivo/negativo que caen en el mismo intervalo, que cuentan
+    como empate: el error es como mucho la mitad de la fracción de esos pares
+    (con N_INTERVALOS = 10⁵, ±5·10⁻⁶ en probabilidad). Se imprime esa cota.
+    """
+    n_intervalos = intervalos_histograma(ensamble, modo)
+    conteos = np.zeros(4, dtype=np.int64)
+    hist_pos = np.zeros(n_intervalos + 1, dtype=np.int64)
+    hist_neg = np.zeros(n_intervalos + 1, dtype=np.int64)
+    filas = 0
+
+    for bloque in leer_por_bloques(csv_path, chunksize):
+        y = etiquetas(bloque).to_numpy()
+        with medir("predecir_bloque", filas=len(bloque)):
+            proba = ensamble.predecir_proba(bloque[columnas_utiles], modo, hilos)
+        contar("bloques_evaluados")
+        pred = (proba >= 0.5).astype(int)
+        conteos += np.bincount(2 * y + pred, minlength=4)
+
+        intervalo = np.rint(proba * n_intervalos).astype(np.int64)
+        hist_pos += np.bincount(intervalo[y == 1], minlength=n_intervalos + 1)
+        hist_neg += np.bincount(intervalo[y == 0], minlength=n_intervalos + 1)
+        filas += len(bloque)
+        print(f"   {filas:,} filas evaluadas", end="\r")
+    print()
+
+    if n_intervalos == N_INTERVALOS:
+        print(f"📏 Error máximo del AUC por el histograma: {cota_error_auc(hist_pos, hist_neg):.2e}")
+    cm = conteos.reshape(2, 2)
+    fpr, tpr = roc_desde_histogramas(hist_pos, hist_neg)
+    return cm, fpr, tpr
+
+
+def intervalos_histograma(ensamble, modo):
+    """Intervalos del histograma de probabilidades para el modo de votación.
+
+    Con votación dura la probabilidad es votos / miembros: un intervalo por
+    número de votos da la curva exacta. En el resto de modos (hojas impuras,
+    pesos) los valores posibles no están acotados y se usan N_INTERVALOS.
+    """
+    if modo == "dura":
+        return len(ensamble.miembros)
+    return N_INTERVALOS
+
+
+def roc_desde_histogramas(hist_pos, hist_neg):
+    """Curva ROC a partir de conteos de positivos/negativos por intervalo de probabilidad."""
+    tp = np.concatenate([[0], np.cumsum(hist_pos[::-1])])
+    fp = np.concatenate([[0], np.cumsum(hist_neg[::-1])])
+    return fp / max(fp[-1], 1), tp / max(tp[-1], 1)
+
+
+def cota_error_auc(hist_pos, hist_neg):
+    """Cota del error del AUC del histograma: la mitad de los pares positivo/negativo de un mismo intervalo."""
+    pares = hist_pos.sum() * hist_neg.sum()
+    return float(0.5 * np.dot(hist_pos, hist_neg) / max(pares, 1))
+
+
+def graficar(cm, fpr, tpr, modo, carpeta_salida=None):
+    """Muestra las gráficas, o las guarda como PNG en carpeta_salida (modo sin ventana)."""
+    import matplotlib
+    if carpeta_salida:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from sklearn.metrics import ConfusionMatrixDisplay
+
+    roc_auc = auc(fpr, tpr)
+
+    # 📊 Matriz de confusión
+    disp = ConfusionMatrixDisplay(confusion_matrix=cm)
+    disp.plot()
+    plt.title(f"Matriz de Confusión acumulada (votación {modo})")
+    if carpeta_salida:
+        os.makedirs(carpeta_salida, exist_ok=True)
+        plt.savefig(os.path.join(carpeta_salida, "matriz_confusion.png"), bbox_inches="tight")
+        plt.close()
+    else:
+        plt.show()
+
+    # 📈 Curva ROC
+    plt.figure()
+    plt.plot(fpr, tpr, label=f"AUC {modo} = {roc_auc:.2f}", color='darkorange')
+    plt.plot([0, 1], [0, 1], linestyle='--', color='gray')
+    plt.xlabel('FPR')
+    plt.ylabel('TPR')
+    plt.title('Curva ROC (ensamble de todos los entrenamientos)')
+    plt.legend(loc="lower right")
+    plt.grid()
+    if carpeta_salida:
+        plt.savefig(os.path.join(carpeta_salida, "curva_roc.png"), bbox_inches="tight")
+        plt.close()
+        print(f"🖼️ Gráficas guardadas en {carpeta_salida}")
+    else:
+        plt.show()
+    return roc_auc
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evalúa el ensamble de todos los modelos guardados.")
+    parser.add_argument("--csv", default=RUTA_CSV, help="Dataset de evaluación")
+    parser.add_argument("--modo", choices=MODOS, default="suave", help="Modo de votación del ensamble")
+    parser.add_argument("--pesos", help="Pesos por modelo separados por comas (modo 'ponderado')")
+    parser.add_argument("--hilos", type=int, default=None, help="Hilos para evaluar los modelos en paralelo")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Evalúa por bloques con memoria acotada (datasets mayores que la RAM)")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="Filas por bloque en modo streaming")
+    parser.add_argument("--salida-graficos", help="Carpeta donde guardar las gráficas en lugar de mostrarlas")
+    parser.add_argument("--sin-cache", action="store_true",
+                        help="No reutiliza ni guarda las probabilidades por modelo")
+    args = parser.parse_args()
+
+    pesos = [float(p) for p in args.pesos.split(",")] if args.pesos else None
+    perfil_desde_entorno("analizar_modelos")
+
+    with medir("evaluacion_total", streaming=args.streaming, modo=args.modo):
+        if args.streaming:
+            with medir("cargar_modelos"):
+                ensamble = Ensamble.desde_registro(pesos=pesos)
+            print(f"🤖 {len(ensamble.miembros)} modelos, {ensamble.n_grupos_encoders} juego(s) de encoders distintos")
+            cm, fpr, tpr = evaluar_streaming(ensamble, args.csv, args.modo, args.hilos, args.chunksize)
+        else:
+            cm, fpr, tpr = evaluar_en_memoria(args.csv, args.modo, args.hilos, pesos, not args.sin_cache)
+
+    with medir("graficar", guardar=bool(args.salida_graficos)):
+        roc_auc = graficar(cm, fpr, tpr, args.modo, args.salida_graficos)
+    print(f"📈 AUC = {roc_auc:.4f} | Matriz de confusión: {cm.tolist()}")
+    if contadores():
+        print("🔢 " + ", ".join(f"{k}: {v}" for k, v in contadores().items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+# benchmark.py
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+import almacen_modelos
+import registro_modelos
+from datos import cargar_dataset, columnas_utiles, tipos_columnas, columna_objetivo
+from utils_model import entrenar_modelo, cargar_config
+from puntuar_lote import puntuar_csv
+from analizar_modelos import evaluar_en_memoria
+from instrumentacion import rss_actual_mb, recolectar, memoria_pico
+
+
+def generar_dataset(path, filas, semilla=0, bloque=1_000_000):
+    """Escribe un CSV sintético con las mismas columnas que el dataset de aerolíneas.
+
+    Se genera por bloques para que 10M de filas no necesiten 10M de filas en memoria.
+    La satisfacción depende de las valoraciones, la clase y el retraso, con ruido.
+    """
+    rng = np.random.default_rng(semilla)
+    escritas = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        while escritas < filas:
+            n = min(bloque, filas - escritas)
+            df = pd.DataFrame({
+                "Age": rng.integers(7, 86, n),
+                "Type of Travel": rng.choice(["Business travel", "Personal Travel"], n, p=[0.7, 0.3]),
+                "Class": rng.choice(["Business", "Eco", "Eco Plus"], n, p=[0.48, 0.45, 0.07]),
+                "Flight Distance": rng.integers(50, 6950, n),
+                "Inflight entertainment": rng.integers(0, 6, n),
+                "On-board service": rng.integers(0, 6, n),
+                "Cleanliness": rng.integers(0, 6, n),
+                "Arrival Delay in Minutes": rng.exponential(15, n).round(),
+                "Departure Delay in Minutes": rng.exponential(15, n).round().astype(int),
+            })
+            df.loc[rng.random(n) < 0.003, "Arrival Delay in Minutes"] = np.nan
+            puntuacion = (df["Inflight entertainment"] + 0.5 * df["On-board service"] + 0.5 * df["Cleanliness"]
+                          + 1.5 * (df["Class"] == "Business") - df["Departure Delay in Minutes"] / 60
+                          + rng.normal(0, 1.5, n))
+            df[columna_objetivo] = np.where(puntuacion > 6, "satisfied", "dissatisfied")
+            df.to_csv(f, header=(escritas == 0), index=False)
+            escritas += n
+    return path
+
+
+# Etapas que mide entrenar_modelo (instrumentacion.medir) -> nombre en el informe
+SUBETAPAS_ENTRENAR = {
+    "cargar_dataset": "entrenar_cargar_dataset",
+    "perfil_datos": "entrenar_perfil_datos",
+    "codificar": "entrenar_codificar",
+    "entrenar": "entrenar_fit",
+    "guardar": "entrenar_guardar",
+}
+
+
+class Cronometro:
+    """Tiempo por etapa, RSS al terminarla y pico de RSS durante la etapa (ver memoria_pico).
+
+    Cada tamaño se mide en su propio proceso (ver medir_en_subproceso), así
+    que las etapas de un tamaño no heredan la memoria de los anteriores.
+    """
+
+    def __init__(self):
+        self.etapas = {}
+
+    @contextmanager
+    def etapa(self, nombre):
+        inicio = time.perf_counter()
+        with memoria_pico() as memoria:
+            yield
+            pico_mb = memoria.pico_mb()
+        self.etapas[nombre] = {"segundos": round(time.perf_counter() - inicio, 4),
+                               "rss_mb": rss_actual_mb(), "rss_pico_mb": pico_mb}
+
+
+def medir_tamano(filas, directorio, n_estimators, max_depth, n_jobs, repeticiones, miembros):
+    """Mide las funciones reales del proyecto sobre un dataset sintético de `filas` filas.
+
+    Se trabaja dentro de `directorio` (models/, encoders/ y cachés propios):
+    entrenamiento con entrenar_modelo (tandas warm_start, OOB, guardado),
+    carga por el registro y su caché, predicción de una fila como la hace la
+    interfaz (bosque plano y sklearn), puntuación por lotes y la evaluación
+    del ensamble de analizar_modelos, sin y con la caché de probabilidades.
+    """
+    os.chdir(directorio)
+    csv_path = generar_dataset(os.path.join(directorio, f"sintetico_{filas}.csv"), filas)
+    config = cargar_config(None, n_estimators=n_estimators, max_depth=max_depth, n_jobs=n_jobs)
+    c = Cronometro()
+
+    with c.etapa("csv_parse"):
+        pd.read_csv(csv_path, usecols=columnas_utiles + [columna_objetivo], dtype=tipos_columnas)
+    with c.etapa("cache_columnar_construir"):
+        cargar_dataset(csv_path)
+    with c.etapa("cache_columnar_cargar"):
+        cargar_dataset(csv_path)
+
+    with c.etapa("entrenar"), recolectar() as subetapas:
+        metadatos = entrenar_modelo(csv_path, 1, config=config)
+    # Subetapas medidas por entrenar_modelo (carga, perfil, codificar, fit,
+    # guardar), para separar una regresión del fit de una de E/S
+    for subetapa, ms in subetapas:
+        if subetapa in SUBETAPAS_ENTRENAR:
+            c.etapas[SUBETAPAS_ENTRENAR[subetapa]] = {"segundos": round(ms / 1000, 4), "dentro_de": "entrenar"}
+    c.etapas["entrenar"]["auc_validacion"] = metadatos["auc_validacion"]
+    c.etapas["entrenar"]["mb_disco"] = round(os.path.getsize(almacen_modelos.ruta_modelo(1)) / 1e6, 2)
+    registro_modelos.establecer_actual(1)
+
+    registro_modelos.limpiar_cache()
+    with c.etapa("cargar_registro_frio"):
+        registro_modelos.cargar(1)
+    with c.etapa("cargar_registro_cache"):
+        registro_modelos.cargar(1)
+    with c.etapa("exportar_plano"):
+        registro_modelos.cargar_plano(1)
+
+    fila = generar_fila(csv_path)
+    for etapa, plano in (("predecir_fila_plano", True), ("predecir_fila_sklearn", False)):
+        with c.etapa(etapa):
+            for _ in range(repeticiones):
+                registro_modelos.predecir(fila, 1, plano=plano)
+        c.etapas[etapa]["ms_por_fila"] = round(c.etapas[etapa]["segundos"] * 1000 / repeticiones, 3)
+
+    with c.etapa("puntuar_lote"):
+        puntuar_csv(csv_path, os.path.join(directorio, "puntuado.csv"), 1)
+
+    # Miembros adicionales como copias del modelo 1: cuestan lo mismo de evaluar
+    for modelo_id in range(2, miembros + 1):
+        for origen, destino in ((almacen_modelos.ruta_modelo(1), almacen_modelos.ruta_modelo(modelo_id)),
+                                (almacen_modelos.ruta_metadatos(1), almacen_modelos.ruta_metadatos(modelo_id)),
+                                (almacen_modelos.ruta_encoder(1),
+                                 os.path.join(almacen_modelos.DIR_ENCODERS, f"encoder_{modelo_id}.json"))):
+            shutil.copyfile(origen, destino)
+    with c.etapa("ensemble_evaluate"):
+        evaluar_en_memoria(csv_path, "suave", None, usar_cache=False)
+    evaluar_en_memoria(csv_path, "suave", None)
+    with c.etapa("ensemble_evaluate_cache"):
+        evaluar_en_memoria(csv_path, "suave", None)
+
+    return {"filas": filas, "etapas": c.etapas}
+
+
+def generar_fila(csv_path):
+    """Primera fila del CSV como dict columna -> valor (la entrada del formulario)."""
+    fila = pd.read_csv(csv_path, usecols=columnas_utiles, nrows=1).iloc[0]
+    return {col: (fila[col].item() if hasattr(fila[col], "item") else fila[col]) for col in columnas_utiles}
+
+
+def medir_en_subproceso(filas, args):
+    """Ejecuta medir_tamano en un proceso nuevo para que el pico de RSS sea el de ese tamaño."""
+    with tempfile.TemporaryDirectory() as directorio:
+        salida = os.path.join(directorio, "resultado.json")
+        comando = [sys.executable, os.path.abspath(__file__), "--_tamano", str(filas), "--_directorio", directorio,
+                   "--_resultado", salida, "--n-estimators", str(args.n_estimators), "--n-jobs", str(args.n_jobs),
+                   "--repeticiones", str(args.repeticiones), "--miembros", str(args.miembros)]
+        if args.max_depth is not None:
+            comando += ["--max-depth", str(args.max_depth)]
+        r = subprocess.run(comando, capture_output=True, text=True)
+        if r.returncode != 0:
+            raise RuntimeError(f"Falló la medición con {filas} filas:\n{r.stderr}")
+        with open(salida, encoding="utf-8") as f:
+            return json.load(f)
+
+
+def medir_arranque_gui(repeticiones):
+    """Arranque en frío de interfaz.py: mediana de `repeticiones` procesos nuevos.
+
+    Cada proceso se abre con --medir-arranque, que imprime en JSON cuándo la
+    ventana quedó visible y cuándo terminó la precarga de los módulos de ML,
+    y se cierra solo. Devuelve None si no hay pantalla disponible.
+    """
+    medidas = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        r = subprocess.run([sys.executable, "interfaz.py", "--medir-arranque"], capture_output=True,
+                           text=True, timeout=300)
+        if r.returncode != 0:
+            print(f"⚠️ No se pudo medir el arranque de la interfaz: {r.stderr.strip().splitlines()[-1:]}")
+            return None
+        medida = json.loads(r.stdout.strip().splitlines()[-1])
+        medida["proceso_total"] = round((time.perf_counter() - inicio) * 1000, 3)
+        medidas.append(medida)
+    return {clave: round(float(np.median([m[clave] for m in medidas if clave in m])), 1)
+            for clave in medidas[0]}
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(actual, base):
+    """Imprime, por tamaño y etapa, la razón tiempo_actual / tiempo_base."""
+    previos = {r["filas"]: r["etapas"] for r in base["resultados"]}
+    for resultado in actual["resultados"]:
+        anteriores = previos.get(resultado["filas"])
+        if not anteriores:
+            continue
+        print(f"\n📊 {resultado['filas']:,} filas (vs {base.get('commit')})")
+        for etapa, valores in resultado["etapas"].items():
+            if etapa in anteriores and anteriores[etapa]["segundos"] > 0:
+                razon = valores["segundos"] / anteriores[etapa]["segundos"]
+                marca = "⚠️" if razon > 1.2 else "  "
+                print(f"  {marca} {etapa:<26} {valores['segundos']:>9.3f} s  x{razon:.2f}")
+
+    if actual.get("arranque_gui") and base.get("arranque_gui"):
+        print(f"\n🚀 Arranque de la interfaz (vs {base.get('commit')})")
+        for clave, ms in actual["arranque_gui"].items():
+            previo = base["arranque_gui"].get(clave)
+            if previo:
+                marca = "⚠️" if ms / previo > 1.2 else "  "
+                print(f"  {marca} {clave:<26} {ms:>9.1f} ms  x{ms / previo:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de entrenamiento, carga y predicción.")
+    parser.add_argument("--filas", default="10000,100000",
+                        help="Tamaños del dataset sintético separados por comas (p. ej. 10000,1000000,10000000)")
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--repeticiones", type=int, default=100, help="Repeticiones de la predicción de una fila")
+    parser.add_argument("--miembros", type=int, default=4, help="Modelos en el ensamble evaluado")
+    parser.add_argument("--salida", default="benchmark.json")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para comparar")
+    parser.add_argument("--arranque-gui", type=int, default=0, metavar="N",
+                        help="Mide también el arranque en frío de la interfaz (N procesos; requiere pantalla)")
+    # Uso interno: medición de un tamaño en un proceso propio (ver medir_en_subproceso)
+    parser.add_argument("--_tamano", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--_directorio", help=argparse.SUPPRESS)
+    parser.add_argument("--_resultado", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._tamano:
+        resultado = medir_tamano(args._tamano, args._directorio, args.n_estimators, args.max_depth,
+                                 args.n_jobs, args.repeticiones, args.miembros)
+        with open(args._resultado, "w", encoding="utf-8") as f:
+            json.dump(resultado, f)
+        return
+
+    resultados = []
+    for filas in (int(f) for f in args.filas.split(",")):
+        print(f"⏱️ {filas:,} filas...")
+        resultados.append(medir_en_subproceso(filas, args))
+        for etapa, valores in resultados[-1]["etapas"].items():
+            if "dentro_de" in valores:
+                print(f"     {etapa:<24} {valores['segundos']:>9.3f} s")
+            else:
+                print(f"   {etapa:<26} {valores['segundos']:>9.3f} s  (RSS {valores['rss_mb']} MB, "
+                      f"pico {valores['rss_pico_mb']} MB)")
+
+    informe = {
+        "commit": _commit_actual(),
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "sklearn": sklearn.__version__,
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "parametros": {"n_estimators": args.n_estimators, "max_depth": args.max_depth, "n_jobs": args.n_jobs},
+        "resultados": resultados,
+    }
+    if args.arranque_gui:
+        informe["arranque_gui"] = medir_arranque_gui(args.arranque_gui)
+        if informe["arranque_gui"]:
+            print("🚀 Arranque de la interfaz: " + ", ".join(f"{k} {v} ms" for k, v in informe["arranque_gui"].items()))
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, indent=2)
+    print(f"✅ Resultados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(informe, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
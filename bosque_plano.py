@@ -0,0 +1,217 @@
+# bosque_plano.py
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+
+from almacen_modelos import ruta_plano
+
+ARCHIVOS = ("caracteristica", "umbral", "izquierdo", "derecho", "faltante_izquierda", "es_hoja", "valor", "raices")
+
+
+class BosquePlano:
+    """RandomForestClassifier aplanado en arrays contiguos de NumPy.
+
+    Los nodos de todos los árboles se concatenan; los hijos guardan índices
+    globales y las hojas apuntan a sí mismas, así que recorrer todos los
+    árboles para todas las filas es un bucle de `profundidad` pasos
+    vectorizados. predecir_proba reproduce exactamente el predict_proba de
+    sklearn: mismas comparaciones en float32, mismo tratamiento de nulos,
+    mismas hojas normalizadas y la misma suma árbol a árbol.
+    """
+
+    def __init__(self, arrays, clases, columnas, profundidad):
+        for nombre in ARCHIVOS:
+            setattr(self, nombre, arrays[nombre])
+        self.clases = np.asarray(clases)
+        self.columnas = list(columnas)
+        self.profundidad = int(profundidad)
+
+    @property
+    def n_arboles(self):
+        return len(self.raices)
+
+    @classmethod
+    def desde_modelo(cls, model):
+        partes = {nombre: [] for nombre in ARCHIVOS}
+        desplazamiento = 0
+        profundidad = 0
+        for estimador in model.estimators_:
+            arbol = estimador.tree_
+            n = arbol.node_count
+            locales = np.arange(n)
+            es_hoja = arbol.children_left == -1
+
+            partes["raices"].append(desplazamiento)
+            partes["es_hoja"].append(es_hoja)
+            partes["caracteristica"].append(np.where(es_hoja, 0, arbol.feature))
+            partes["umbral"].append(arbol.threshold)
+            partes["izquierdo"].append(np.where(es_hoja, locales, arbol.children_left) + desplazamiento)
+            partes["derecho"].append(np.where(es_hoja, locales, arbol.children_right) + desplazamiento)
+            partes["faltante_izquierda"].append(
+                getattr(arbol, "missing_go_to_left", np.zeros(n, dtype=np.uint8)).astype(bool))
+
+            # Igual que DecisionTreeClassifier.predict_proba: cada hoja se
+            # normaliza por la suma de sus valores (0 -> 1)
+            valor = arbol.value[:, 0, :model.n_classes_].copy()
+            normalizador = valor.sum(axis=1)[:, np.newaxis]
+            normalizador[normalizador == 0.0] = 1.0
+            partes["valor"].append(valor / normalizador)
+
+            desplazamiento += n
+            profundidad = max(profundidad, arbol.max_depth)
+
+        arrays = {
+            "caracteristica": np.concatenate(partes["caracteristica"]).astype(np.int32),
+            "umbral": np.concatenate(partes["umbral"]).astype(np.float64),
+            "izquierdo": np.concatenate(partes["izquierdo"]).astype(np.int32),
+            "derecho": np.concatenate(partes["derecho"]).astype(np.int32),
+            "faltante_izquierda": np.concatenate(partes["faltante_izquierda"]),
+            "es_hoja": np.concatenate(partes["es_hoja"]),
+            "valor": np.ascontiguousarray(np.concatenate(partes["valor"])),
+            "raices": np.asarray(partes["raices"], dtype=np.int32),
+        }
+        # Modelos entrenados con arrays sin nombres: columnas por posición
+        columnas = getattr(model, "feature_names_in_", [str(i) for i in range(model.n_features_in_)])
+        return cls(arrays, model.classes_, columnas, profundidad)
+
+    def guardar(self, directorio):
+        """Guarda un .npy por array (sin comprimir, para abrirlos con mmap)."""
+        os.makedirs(directorio, exist_ok=True)
+        for nombre in ARCHIVOS:
+            np.save(os.path.join(directorio, f"{nombre}.npy"), getattr(self, nombre))
+        with open(os.path.join(directorio, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"clases": self.clases.tolist(), "columnas": self.columnas,
+                       "profundidad": self.profundidad}, f)
+
+    @classmethod
+    def cargar(cls, directorio, mmap=True):
+        """Carga los arrays; con mmap=True varios procesos comparten las mismas páginas."""
+        with open(os.path.join(directorio, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = {nombre: np.load(os.path.join(directorio, f"{nombre}.npy"), mmap_mode="r" if mmap else None)
+                  for nombre in ARCHIVOS}
+        return cls(arrays, meta["clases"], meta["columnas"], meta["profundidad"])
+
+    def hojas(self, X):
+        """Índice global de la hoja alcanzada por cada fila en cada árbol: array (n_filas, n_arboles)."""
+        X = np.asarray(X, dtype=np.float32)
+        filas = np.arange(len(X))[:, np.newaxis]
+        nodos = np.broadcast_to(self.raices, (len(X), self.n_arboles)).copy()
+        for _ in range(self.profundidad):
+            activos = ~self.es_hoja[nodos]
+            if not activos.any():
+                break
+            x = X[filas, self.caracteristica[nodos]]
+            ir_izquierda = (x <= self.umbral[nodos]) | (np.isnan(x) & self.faltante_izquierda[nodos])
+            nodos = np.where(ir_izquierda, self.izquierdo[nodos], self.derecho[nodos])
+        return nodos
+
+    def predecir_proba(self, X, tam_bloque=4096):
+        """Probabilidades por clase, (n_filas, n_clases), idénticas a model.predict_proba(X).
+
+        X es un array (o DataFrame) con las columnas en el orden de self.columnas
+        y las categóricas ya codificadas.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        salida = np.empty((len(X), self.valor.shape[1]), dtype=np.float64)
+        for inicio in range(0, len(X), tam_bloque):
+            hojas = self.hojas(X[inicio:inicio + tam_bloque])
+            acumulado = np.zeros((len(hojas), self.valor.shape[1]), dtype=np.float64)
+            # Suma en el mismo orden que sklearn (árbol a árbol) para obtener
+            # exactamente los mismos decimales
+            for t in range(self.n_arboles):
+                acumulado += self.valor[hojas[:, t]]
+            acumulado /= self.n_arboles
+            salida[inicio:inicio + tam_bloque] = acumulado
+        return salida
+
+    def predecir(self, X):
+        return self.clases.take(np.argmax(self.predecir_proba(X), axis=1))
+
+    def vector_fila(self, entrada, codificador):
+        """Convierte una fila (dict columna -> valor) en el vector float32 que espera el bosque."""
+        valores = []
+        for col in self.columnas:
+            valor = entrada[col]
+            if col in codificador.clases:
+                valor = codificador.codigo(col, valor)
+            valores.append(np.nan if valor is None else valor)
+        return np.asarray(valores, dtype=np.float32)
+
+
+def exportar(modelo_id, model=None):
+    """Aplana el modelo guardado `modelo_id` y lo escribe en models/model_{id}_plano/."""
+    if model is None:
+        from almacen_modelos import cargar_modelo
+        model = cargar_modelo(modelo_id)
+    plano = BosquePlano.desde_modelo(model)
+    plano.guardar(ruta_plano(modelo_id))
+    return plano
+
+
+def comparar_latencia(modelo_id, repeticiones=200, n_lote=10_000):
+    """Compara latencia y resultados del predict_proba de sklearn con el bosque plano."""
+    import registro_modelos
+    from datos import cargar_dataset, columnas_utiles
+
+    model, codificador = registro_modelos.cargar(modelo_id)
+    plano = BosquePlano.desde_modelo(model)
+
+    df = cargar_dataset()
+    X = codificador.transformar(df[columnas_utiles].iloc[:n_lote])[plano.columnas]
+    iguales = np.array_equal(model.predict_proba(X), plano.predecir_proba(X.to_numpy()))
+
+    fila = X.iloc[[0]]
+    fila_np = fila.to_numpy()
+
+    def medir(funcion):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append(time.perf_counter() - inicio)
+        return np.median(tiempos) * 1000, np.percentile(tiempos, 95) * 1000
+
+    sk = medir(lambda: model.predict_proba(fila))
+    pl = medir(lambda: plano.predecir_proba(fila_np))
+
+    inicio = time.perf_counter()
+    model.predict_proba(X)
+    sk_lote = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    plano.predecir_proba(X.to_numpy())
+    pl_lote = time.perf_counter() - inicio
+
+    return {"iguales": bool(iguales), "n_arboles": plano.n_arboles, "n_nodos": int(len(plano.umbral)),
+            "sklearn_fila_ms": sk, "plano_fila_ms": pl,
+            "sklearn_lote_s": sk_lote, "plano_lote_s": pl_lote, "n_lote": len(X)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta un modelo a arrays planos y mide su latencia.")
+    parser.add_argument("--modelo", type=int, default=None, help="Id del modelo (por defecto, el actual)")
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--solo-exportar", action="store_true")
+    args = parser.parse_args()
+
+    import registro_modelos
+    modelo_id = args.modelo if args.modelo is not None else registro_modelos.modelo_actual_id()
+    plano = exportar(modelo_id)
+    print(f"✅ Modelo {modelo_id} exportado a {ruta_plano(modelo_id)} ({len(plano.umbral)} nodos)")
+    if args.solo_exportar:
+        return
+
+    r = comparar_latencia(modelo_id, args.repeticiones)
+    print(f"🔍 Mismo resultado que predict_proba: {'SÍ' if r['iguales'] else 'NO'}")
+    print(f"⚡ 1 fila  - sklearn: {r['sklearn_fila_ms'][0]:.2f} ms (p95 {r['sklearn_fila_ms'][1]:.2f})"
+          f" | plano: {r['plano_fila_ms'][0]:.3f} ms (p95 {r['plano_fila_ms'][1]:.3f})")
+    print(f"📦 {r['n_lote']} filas - sklearn: {r['sklearn_lote_s']:.3f} s | plano: {r['plano_lote_s']:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
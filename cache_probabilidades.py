@@ -0,0 +1,87 @@
+# cache_probabilidades.py
+import os
+import json
+import hashlib
+
+import numpy as np
+
+from almacen_modelos import DIR_MODELOS, ruta_modelo, ruta_encoder
+from datos import hash_archivo, huella_csv
+
+DIR_CACHE = os.path.join(DIR_MODELOS, ".cache_probabilidades")
+ARCHIVO_HASHES = os.path.join(DIR_CACHE, "hashes.json")
+
+
+def _cargar_hashes():
+    try:
+        with open(ARCHIVO_HASHES, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _guardar_hashes(hashes):
+    os.makedirs(DIR_CACHE, exist_ok=True)
+    tmp = ARCHIVO_HASHES + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(hashes, f, indent=2)
+    os.replace(tmp, ARCHIVO_HASHES)
+
+
+def hash_memorizado(path, hashes):
+    """sha1 del archivo; se reutiliza el anterior mientras tamaño y mtime no cambien."""
+    st = os.stat(path)
+    previo = hashes.get(path)
+    if previo and previo["tamano"] == st.st_size and previo["mtime_ns"] == st.st_mtime_ns:
+        return previo["sha1"]
+    sha1 = hash_archivo(path)
+    hashes[path] = {"tamano": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": sha1}
+    return sha1
+
+
+def claves(ids, csv_path):
+    """Clave de caché por modelo: hash(modelo) + hash(encoder) + huella del dataset."""
+    hashes = _cargar_hashes()
+    huella_dataset = huella_csv(csv_path)["sha1"]
+    resultado = {}
+    for modelo_id in ids:
+        partes = (hash_memorizado(ruta_modelo(modelo_id), hashes),
+                  hash_memorizado(ruta_encoder(modelo_id), hashes),
+                  huella_dataset)
+        # El prefijo del dataset permite limpiar sin tocar cachés de otros CSV
+        resultado[modelo_id] = f"{huella_dataset[:12]}_{hashlib.sha1('|'.join(partes).encode()).hexdigest()}"
+    _guardar_hashes(hashes)
+    return resultado
+
+
+def _ruta(clave):
+    return os.path.join(DIR_CACHE, f"{clave}.npy")
+
+
+def leer(clave):
+    """Vector float32 de probabilidades guardado para la clave, o None."""
+    try:
+        return np.load(_ruta(clave))
+    except (OSError, ValueError):
+        return None
+
+
+def guardar(clave, probabilidades):
+    os.makedirs(DIR_CACHE, exist_ok=True)
+    tmp = _ruta(clave) + ".tmp.npy"
+    np.save(tmp, np.asarray(probabilidades, dtype=np.float32))
+    os.replace(tmp, _ruta(clave))
+
+
+def limpiar(claves_vigentes):
+    """Borra los vectores del mismo dataset cuyo modelo o encoder ya no existe o cambió."""
+    if not claves_vigentes or not os.path.isdir(DIR_CACHE):
+        return 0
+    prefijo = next(iter(claves_vigentes)).split("_")[0] + "_"
+    vigentes = {f"{clave}.npy" for clave in claves_vigentes}
+    borrados = 0
+    for f in os.listdir(DIR_CACHE):
+        if f.startswith(prefijo) and f.endswith(".npy") and f not in vigentes:
+            os.remove(os.path.join(DIR_CACHE, f))
+            borrados += 1
+    return borrados
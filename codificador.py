@@ -0,0 +1,99 @@
+# codificador.py
+import os
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Código asignado a valores que no se vieron durante el entrenamiento (o nulos)
+DESCONOCIDO = -1
+
+VERSION_FORMATO = 1
+
+
+class CodificadorCategorico:
+    """Codificador de columnas categóricas basado en listas de clases ordenadas.
+
+    Asigna a cada valor su posición en la lista ordenada de clases, igual que
+    sklearn.preprocessing.LabelEncoder, así que los modelos entrenados con los
+    encoders en pickle dan la misma salida. Los valores desconocidos reciben
+    DESCONOCIDO en lugar de lanzar un error.
+    """
+
+    def __init__(self, clases):
+        self.clases = {col: list(valores) for col, valores in clases.items()}
+
+    @classmethod
+    def ajustar(cls, X, columnas=None):
+        """Aprende las clases de las columnas indicadas (por defecto, las de texto/categóricas)."""
+        if columnas is None:
+            columnas = X.select_dtypes(include=['object', 'category']).columns
+        clases = {}
+        for col in columnas:
+            valores = X[col].dropna()
+            if isinstance(valores.dtype, pd.CategoricalDtype):
+                valores = valores.astype(object)
+            clases[col] = [str(v) for v in np.unique(valores.to_numpy())]
+        return cls(clases)
+
+    @classmethod
+    def desde_label_encoders(cls, encoders):
+        return cls({col: [str(c) for c in le.classes_] for col, le in encoders.items()})
+
+    @property
+    def columnas(self):
+        return list(self.clases)
+
+    def firma(self):
+        """Tupla hashable que identifica el codificador (dos iguales codifican igual)."""
+        return tuple(sorted((col, tuple(valores)) for col, valores in self.clases.items()))
+
+    def transformar(self, X):
+        """Devuelve una copia de X con las columnas categóricas convertidas a códigos enteros."""
+        X = X.copy()
+        for col, valores in self.clases.items():
+            if col in X.columns:
+                X[col] = pd.Categorical(X[col], categories=valores).codes
+        return X
+
+    def codigo(self, col, valor):
+        try:
+            return self.clases[col].index(valor)
+        except ValueError:
+            return DESCONOCIDO
+
+    def guardar(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": VERSION_FORMATO, "clases": self.clases}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+    @classmethod
+    def cargar(cls, path):
+        """Carga un codificador desde JSON o, por compatibilidad, desde un pickle de LabelEncoders."""
+        if path.endswith(".json"):
+            with open(path, encoding="utf-8") as f:
+                return cls(json.load(f)["clases"])
+        import joblib
+        return cls.desde_label_encoders(joblib.load(path))
+
+
+def migrar_encoders(directorio="encoders"):
+    """Escribe un encoder_{id}.json junto a cada encoder_{id}.pkl que aún no lo tenga."""
+    migrados = []
+    for f in sorted(os.listdir(directorio)):
+        if f.startswith("encoder_") and f.endswith(".pkl"):
+            destino = os.path.join(directorio, f[:-len(".pkl")] + ".json")
+            if not os.path.exists(destino):
+                CodificadorCategorico.cargar(os.path.join(directorio, f)).guardar(destino)
+                migrados.append(destino)
+    return migrados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convierte los encoders en pickle a JSON.")
+    parser.add_argument("--directorio", default="encoders")
+    args = parser.parse_args()
+    for destino in migrar_encoders(args.directorio):
+        print(f"✅ {destino}")
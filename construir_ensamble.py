@@ -0,0 +1,201 @@
+# construir_ensamble.py
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+
+import almacen_modelos
+from datos import cargar_dataset, etiquetas, columnas_utiles, hashes_filas, huella_filas, RUTA_CSV
+from codificador import CodificadorCategorico
+from utils_model import cargar_config, hiperparametros, RUTA_CONFIG
+from monitor_deriva import perfil_referencia
+from memoria_compartida import compartir, liberar, iniciar_trabajador, matrices
+from instrumentacion import medir, perfil_desde_entorno
+
+ESTRATEGIAS = ("bootstrap", "temporal")
+
+
+def semillas(semilla_base, n):
+    """n semillas independientes y reproducibles derivadas de semilla_base."""
+    return [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(semilla_base).spawn(n)]
+
+
+def fragmentos(n_filas, n_miembros, estrategia, semillas_miembros, excluir=None, fraccion=1.0):
+    """Índices de filas de cada miembro.
+
+    bootstrap: muestreo con reemplazo de `fraccion` * filas disponibles,
+    con la semilla del miembro. temporal: bloques contiguos en el orden del
+    CSV (el dataset no tiene fecha; el orden de llegada hace de tiempo).
+    Las filas de `excluir` (la validación común) no entran en ningún fragmento.
+    """
+    disponibles = np.arange(n_filas)
+    if excluir is not None and len(excluir):
+        disponibles = np.setdiff1d(disponibles, excluir)
+    if estrategia == "bootstrap":
+        tamano = max(1, round(fraccion * len(disponibles)))
+        return [np.sort(np.random.default_rng(s).choice(disponibles, size=tamano, replace=True))
+                for s in semillas_miembros]
+    if estrategia == "temporal":
+        return np.array_split(disponibles, n_miembros)
+    raise ValueError(f"Estrategia desconocida: '{estrategia}'. Use una de {ESTRATEGIAS}.")
+
+
+def _marco(filas):
+    """DataFrame con las filas indicadas de la matriz compartida y los nombres de columna.
+
+    Se construye columna a columna: un DataFrame que envuelve directamente un
+    array 2D queda de solo lectura (copy-on-write) y sklearn lo rechaza al
+    buscar nulos.
+    """
+    bloque = matrices()[0][filas]
+    return pd.DataFrame({col: bloque[:, i] for i, col in enumerate(columnas_utiles)})
+
+
+def entrenar_miembro(modelo_id, filas, validacion, hp, semilla, formato, metadatos):
+    """Entrena y guarda un miembro en un proceso de trabajo.
+
+    Escribe los metadatos y después el modelo (el encoder ya lo escribió el
+    proceso principal). Devuelve (modelo_id, proba de validación o None).
+    """
+    inicio = time.perf_counter()
+    y = matrices()[1]
+    model = RandomForestClassifier(n_jobs=1, **dict(hp, random_state=semilla))
+    # Con nombres de columna, como los modelos de entrenar_modelo (el registro
+    # y el ensamble ordenan las columnas con feature_names_in_)
+    model.fit(_marco(filas), y[filas])
+
+    proba = None
+    if len(validacion):
+        proba = model.predict_proba(_marco(validacion))[:, list(model.classes_).index(1)].astype(np.float32)
+        metadatos["auc_validacion"] = round(float(roc_auc_score(y[validacion], proba)), 4)
+    metadatos.update({
+        "modelo_id": modelo_id,
+        "hiperparametros": dict(hp, random_state=semilla),
+        "n_arboles": len(model.estimators_),
+        "creado": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "metricas": {"segundos": round(time.perf_counter() - inicio, 2), "n_jobs": 1},
+    })
+    almacen_modelos.guardar_metadatos(modelo_id, metadatos)
+    almacen_modelos.guardar_modelo(model, modelo_id, formato)
+    return modelo_id, proba
+
+
+def construir(csv_path=RUTA_CSV, n_miembros=8, estrategia="bootstrap", semilla=42, procesos=None,
+              fraccion_validacion=0.1, fraccion_bootstrap=1.0, config=None):
+    """Entrena n_miembros modelos en paralelo, cada uno con su fragmento y su semilla.
+
+    El dataset se carga y codifica una vez, con un único encoder compartido
+    que se escribe para cada id, y la matriz se comparte entre procesos sin
+    copiarla. Con fraccion_validacion > 0 se reserva una validación común
+    (las mismas filas para todos) para medir el AUC de cada miembro y del
+    ensamble. Devuelve (ids, auc_miembros, auc_ensamble).
+    """
+    if config is None:
+        config = cargar_config()
+    hp = hiperparametros(config)
+    semillas_miembros = semillas(semilla, n_miembros)
+
+    with medir("ensamble_cargar_codificar"):
+        df = cargar_dataset(csv_path)
+        y = etiquetas(df).to_numpy()
+        codificador = CodificadorCategorico.ajustar(df[columnas_utiles])
+        X = np.ascontiguousarray(codificador.transformar(df[columnas_utiles])[columnas_utiles]
+                                 .to_numpy(dtype=np.float32))
+
+    validacion = np.sort(np.random.default_rng(semilla).permutation(len(y))[:round(fraccion_validacion * len(y))])
+    partes = fragmentos(len(y), n_miembros, estrategia, semillas_miembros, validacion, fraccion_bootstrap)
+
+    comunes = {
+        "modo": "ensamble",
+        "base": None,
+        "huella_dataset": huella_filas(hashes_filas(df)),
+        "filas": len(df),
+        "auc_validacion": None,
+        "formato": config["formato_modelo"],
+        "perfil_datos": perfil_referencia(df),
+    }
+    ids = [almacen_modelos.reservar_id() for _ in range(n_miembros)]
+    memoria_X, descriptor_X = compartir(X)
+    memoria_y, descriptor_y = compartir(y)
+    del X, df
+    probas = {}
+    try:
+        for modelo_id in ids:
+            codificador.guardar(os.path.join(almacen_modelos.DIR_ENCODERS, f"encoder_{modelo_id}.json"))
+        with medir("ensamble_entrenar", miembros=n_miembros, estrategia=estrategia), \
+                ProcessPoolExecutor(max_workers=procesos or os.cpu_count(), initializer=iniciar_trabajador,
+                                    initargs=(descriptor_X, descriptor_y)) as pool:
+            futuros = []
+            for i, (modelo_id, filas, s) in enumerate(zip(ids, partes, semillas_miembros)):
+                metadatos = dict(comunes, ensamble={
+                    "miembro": i, "miembros": n_miembros, "ids": ids, "estrategia": estrategia,
+                    "semilla_base": semilla, "semilla": s, "filas_fragmento": len(filas),
+                    "fragmento": ([int(filas[0]), int(filas[-1]) + 1] if estrategia == "temporal"
+                                  else {"fraccion": fraccion_bootstrap, "reemplazo": True}),
+                    "filas_validacion": len(validacion),
+                })
+                futuros.append(pool.submit(entrenar_miembro, modelo_id, filas, validacion, hp, s,
+                                           config["formato_modelo"], metadatos))
+            for futuro in futuros:
+                modelo_id, proba = futuro.result()
+                probas[modelo_id] = proba
+                print(f"🌲 Miembro {modelo_id} listo ({len(probas)}/{n_miembros})")
+    except BaseException:
+        # Sin miembros a medias en el registro
+        for modelo_id in ids:
+            almacen_modelos.eliminar_modelo(modelo_id)
+        raise
+    finally:
+        liberar(memoria_X, memoria_y)
+        for modelo_id in ids:
+            almacen_modelos.liberar_id(modelo_id)
+
+    auc_miembros, auc_ensamble = {}, None
+    if len(validacion):
+        y_val = y[validacion]
+        auc_miembros = {modelo_id: float(roc_auc_score(y_val, probas[modelo_id])) for modelo_id in ids}
+        auc_ensamble = float(roc_auc_score(y_val, np.mean([probas[modelo_id] for modelo_id in ids], axis=0)))
+    return ids, auc_miembros, auc_ensamble
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entrena en paralelo los miembros de un ensamble diverso.")
+    parser.add_argument("--csv", default=RUTA_CSV)
+    parser.add_argument("--config", default=RUTA_CONFIG, help="Archivo JSON de configuración")
+    parser.add_argument("--miembros", type=int, default=8)
+    parser.add_argument("--estrategia", choices=ESTRATEGIAS, default="bootstrap")
+    parser.add_argument("--semilla", type=int, default=42, help="Semilla base de la que se derivan las de cada miembro")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos de trabajo (por defecto, uno por núcleo)")
+    parser.add_argument("--fraccion-validacion", type=float, default=0.1,
+                        help="Filas reservadas (comunes a todos) para medir el AUC; 0 para no reservar")
+    parser.add_argument("--fraccion-bootstrap", type=float, default=1.0,
+                        help="Tamaño de cada muestra bootstrap respecto a las filas disponibles")
+    parser.add_argument("--n-estimators", type=int)
+    parser.add_argument("--max-depth", type=int)
+    parser.add_argument("--min-samples-leaf", type=int)
+    parser.add_argument("--formato", choices=almacen_modelos.FORMATOS, help="Formato del archivo de cada modelo")
+    args = parser.parse_args()
+    perfil_desde_entorno("construir_ensamble")
+
+    config = cargar_config(args.config, n_estimators=args.n_estimators, max_depth=args.max_depth,
+                           min_samples_leaf=args.min_samples_leaf, formato_modelo=args.formato)
+    inicio = time.perf_counter()
+    ids, auc_miembros, auc_ensamble = construir(args.csv, args.miembros, args.estrategia, args.semilla,
+                                                args.procesos, args.fraccion_validacion,
+                                                args.fraccion_bootstrap, config)
+    print(f"✅ {len(ids)} miembros ({args.estrategia}) guardados como modelos {ids[0]}-{ids[-1]} "
+          f"en {time.perf_counter() - inicio:.1f} s")
+    if auc_ensamble is not None:
+        print("📈 AUC de validación por miembro: "
+              + ", ".join(f"#{modelo_id} {auc:.4f}" for modelo_id, auc in auc_miembros.items()))
+        print(f"🤝 AUC del ensamble (votación suave): {auc_ensamble:.4f} "
+              f"(mejor miembro {max(auc_miembros.values()):.4f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# datos.py
+import os
+import json
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+RUTA_CSV = "data/Airline_customer_satisfaction.csv"
+
+columnas_utiles = ["Age", "Type of Travel", "Class",
+                   "Flight Distance", "Inflight entertainment",
+                   "On-board service", "Cleanliness",
+                   "Arrival Delay in Minutes", "Departure Delay in Minutes"]
+
+columna_objetivo = "satisfaction"
+
+# Tipos compactos por columna. "Arrival Delay in Minutes" tiene nulos en el
+# dataset original, por eso es float32 y no entero.
+tipos_columnas = {
+    "Age": "int16",
+    "Type of Travel": "category",
+    "Class": "category",
+    "Flight Distance": "int32",
+    "Inflight entertainment": "int8",
+    "On-board service": "int8",
+    "Cleanliness": "int8",
+    "Arrival Delay in Minutes": "float32",
+    "Departure Delay in Minutes": "int32",
+    "satisfaction": "category",
+}
+
+VERSION_CACHE = 1
+
+
+def ruta_cache(csv_path):
+    """Directorio de la caché columnar asociada a un CSV (junto al propio CSV)."""
+    base = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(os.path.dirname(csv_path) or ".", ".cache", base)
+
+
+def hash_archivo(path, bloque=1 << 20):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for trozo in iter(lambda: f.read(bloque), b""):
+            h.update(trozo)
+    return h.hexdigest()
+
+
+def _leer_meta(directorio):
+    try:
+        with open(os.path.join(directorio, "meta.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _escribir_meta(directorio, meta):
+    tmp = os.path.join(directorio, "meta.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(directorio, "meta.json"))
+
+
+def huella_csv(csv_path):
+    """Huella del CSV: tamaño, mtime y sha1 del contenido.
+
+    El sha1 solo se recalcula si el tamaño o la mtime cambiaron respecto a la
+    caché; así la comprobación habitual cuesta un único stat.
+    """
+    st = os.stat(csv_path)
+    meta = _leer_meta(ruta_cache(csv_path))
+    if meta and meta.get("tamano") == st.st_size and meta.get("mtime_ns") == st.st_mtime_ns:
+        sha1 = meta["sha1"]
+    else:
+        sha1 = hash_archivo(csv_path)
+    return {"tamano": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": sha1}
+
+
+def _cache_valida(meta, huella):
+    if not meta or meta.get("version") != VERSION_CACHE:
+        return False
+    return meta.get("sha1") == huella["sha1"]
+
+
+def _leer_csv(csv_path):
+    encabezado = pd.read_csv(csv_path, nrows=0).columns
+    for col in columnas_utiles + [columna_objetivo]:
+        if col not in encabezado:
+            raise ValueError(f"La columna '{col}' no está en el archivo CSV.")
+    df = pd.read_csv(csv_path, usecols=columnas_utiles + [columna_objetivo],
+                     dtype=tipos_columnas)
+    return df[columnas_utiles + [columna_objetivo]]
+
+
+def _construir_cache(csv_path, huella):
+    df = _leer_csv(csv_path)
+    directorio = ruta_cache(csv_path)
+    os.makedirs(directorio, exist_ok=True)
+
+    categorias = {}
+    for i, col in enumerate(df.columns):
+        serie = df[col]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            categorias[col] = [str(c) for c in serie.cat.categories]
+            valores = serie.cat.codes.to_numpy()
+        else:
+            valores = serie.to_numpy()
+        np.save(os.path.join(directorio, f"col_{i}.npy"), valores)
+
+    meta = dict(huella, version=VERSION_CACHE, filas=len(df),
+                columnas=list(df.columns), categorias=categorias)
+    _escribir_meta(directorio, meta)
+    return df
+
+
+def cargar_dataset(csv_path=RUTA_CSV, columnas=None, usar_cache=True):
+    """Carga las columnas útiles + "satisfaction" con tipos compactos.
+
+    La primera vez parsea el CSV y escribe un .npy por columna; las llamadas
+    siguientes cargan esos arrays mapeados en memoria sin volver a parsear,
+    mientras el tamaño/mtime/sha1 del CSV no cambien.
+    """
+    if not usar_cache:
+        df = _leer_csv(csv_path)
+        return df[columnas] if columnas else df
+
+    huella = huella_csv(csv_path)
+    directorio = ruta_cache(csv_path)
+    meta = _leer_meta(directorio)
+
+    if not _cache_valida(meta, huella):
+        df = _construir_cache(csv_path, huella)
+        return df[columnas] if columnas else df
+
+    if meta["tamano"] != huella["tamano"] or meta["mtime_ns"] != huella["mtime_ns"]:
+        # Mismo contenido con otra mtime (p. ej. el archivo se copió): se
+        # actualiza la huella para no volver a calcular el sha1.
+        meta.update(huella)
+        _escribir_meta(directorio, meta)
+
+    datos = {}
+    for i, col in enumerate(meta["columnas"]):
+        if columnas and col not in columnas:
+            continue
+        valores = np.load(os.path.join(directorio, f"col_{i}.npy"), mmap_mode="r")
+        if col in meta["categorias"]:
+            datos[col] = pd.Categorical.from_codes(valores, categories=meta["categorias"][col])
+        else:
+            datos[col] = valores
+    df = pd.DataFrame(datos)
+    return df[columnas] if columnas else df
+
+
+def leer_por_bloques(csv_path=RUTA_CSV, chunksize=100_000):
+    """Itera el CSV en bloques de `chunksize` filas (columnas útiles + objetivo, tipos compactos).
+
+    No usa la caché columnar: sirve para datasets que no caben en memoria.
+    """
+    encabezado = pd.read_csv(csv_path, nrows=0).columns
+    for col in columnas_utiles + [columna_objetivo]:
+        if col not in encabezado:
+            raise ValueError(f"La columna '{col}' no está en el archivo CSV.")
+    for bloque in pd.read_csv(csv_path, usecols=columnas_utiles + [columna_objetivo],
+                              dtype=tipos_columnas, chunksize=chunksize):
+        yield bloque[columnas_utiles + [columna_objetivo]]
+
+
+def etiquetas(df):
+    """Convierte la columna "satisfaction" a 1 (satisfied) / 0 (resto)."""
+    return (df[columna_objetivo] == "satisfied").astype(int)
+
+
+def hashes_filas(df):
+    """Hash uint64 de cada fila (columnas útiles + objetivo), independiente del índice."""
+    return pd.util.hash_pandas_object(df[columnas_utiles + [columna_objetivo]], index=False).to_numpy()
+
+
+def huella_filas(hashes, n=None):
+    """sha1 de las n primeras filas (todas si n es None) a partir de hashes_filas()."""
+    return hashlib.sha1(np.ascontiguousarray(hashes[:n]).tobytes()).hexdigest()
@@ -0,0 +1,127 @@
+# ensamble.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+import registro_modelos
+from codificador import CodificadorCategorico
+from datos import columnas_utiles
+
+MODOS = ("suave", "dura", "ponderado")
+
+
+def combinar(probas, modo="suave", pesos=None):
+    """Combina las probabilidades por miembro, array (n_modelos, n_filas), según el modo de votación."""
+    if modo == "suave":
+        return probas.mean(axis=0)
+    if modo == "dura":
+        return (probas >= 0.5).mean(axis=0)
+    if modo == "ponderado":
+        if pesos is None:
+            raise ValueError("El modo 'ponderado' requiere pesos por modelo.")
+        pesos = np.asarray(pesos, dtype=float)
+        return pesos @ probas / pesos.sum()
+    raise ValueError(f"Modo de votación desconocido: '{modo}'. Use uno de {MODOS}.")
+
+
+class Ensamble:
+    """Conjunto de modelos evaluados en paralelo sobre una matriz codificada una sola vez.
+
+    miembros: lista de tuplas (modelo_id, model, codificador).
+    pesos: pesos por miembro para el modo "ponderado" (opcional).
+    """
+
+    def __init__(self, miembros, pesos=None):
+        if not miembros:
+            raise ValueError("El ensamble necesita al menos un modelo.")
+        if pesos is not None and len(pesos) != len(miembros):
+            raise ValueError("Debe haber un peso por cada modelo del ensamble.")
+        self.miembros = list(miembros)
+        self.pesos = None if pesos is None else np.asarray(pesos, dtype=float)
+
+        # Agrupar miembros con codificadores idénticos: cada grupo se codifica una vez
+        self._grupos = {}
+        for i, (_, _, codificador) in enumerate(self.miembros):
+            self._grupos.setdefault(codificador.firma(), []).append(i)
+
+    @classmethod
+    def desde_registro(cls, ids=None, pesos=None):
+        """Carga los modelos guardados (todos, o los ids indicados) y sus encoders."""
+        if ids is None:
+            ids = registro_modelos.listar_modelos()
+        miembros = []
+        for modelo_id in ids:
+            try:
+                model = registro_modelos.cargar_modelo(modelo_id)
+                codificador = CodificadorCategorico.cargar(registro_modelos.ruta_encoder(modelo_id))
+                miembros.append((modelo_id, model, codificador))
+            except Exception as e:
+                print(f"❌ Error al procesar modelo {modelo_id}: {e}")
+        if not miembros:
+            raise ValueError("No se pudo cargar ningún modelo correctamente.")
+        return cls(miembros, pesos)
+
+    @property
+    def ids(self):
+        return [modelo_id for modelo_id, _, _ in self.miembros]
+
+    @property
+    def n_grupos_encoders(self):
+        return len(self._grupos)
+
+    def predecir_proba_miembros(self, X, n_hilos=None):
+        """Devuelve un array (n_modelos, n_filas) con la probabilidad de "satisfied" de cada modelo."""
+        salida = np.empty((len(self.miembros), len(X)), dtype=np.float64)
+
+        tareas = []
+        for indices in self._grupos.values():
+            X_cod = self.miembros[indices[0]][2].transformar(X)
+            for i in indices:
+                tareas.append((i, X_cod))
+
+        def evaluar(tarea):
+            i, X_cod = tarea
+            model = self.miembros[i][1]
+            columnas = list(model.feature_names_in_)
+            if list(X_cod.columns) != columnas:
+                X_cod = X_cod[columnas]
+            proba = model.predict_proba(X_cod)
+            salida[i] = proba[:, list(model.classes_).index(1)]
+
+        with ThreadPoolExecutor(max_workers=n_hilos or os.cpu_count()) as pool:
+            list(pool.map(evaluar, tareas))
+        return salida
+
+    def combinar(self, probas, modo="suave"):
+        return combinar(probas, modo, self.pesos)
+
+    def predecir_proba(self, X, modo="suave", n_hilos=None):
+        return self.combinar(self.predecir_proba_miembros(X, n_hilos), modo)
+
+    def predecir(self, X, modo="suave", n_hilos=None):
+        return (self.predecir_proba(X, modo, n_hilos) >= 0.5).astype(int)
+
+    def predecir_fila(self, entrada, modo="suave"):
+        """Predice una fila (dict columna -> valor). Devuelve (pred, proba_satisfecho)."""
+        X = pd.DataFrame([entrada], columns=columnas_utiles)
+        proba = float(self.predecir_proba(X, modo)[0])
+        return int(proba >= 0.5), proba
+
+
+@lru_cache(maxsize=1)
+def _ensamble_en_cache(clave):
+    return Ensamble.desde_registro([modelo_id for modelo_id, _, _ in clave])
+
+
+def ensamble_registro():
+    """Ensamble con todos los modelos guardados, reutilizado mientras no cambien en disco."""
+    clave = tuple((modelo_id,
+                   os.stat(registro_modelos.ruta_modelo(modelo_id)).st_mtime_ns,
+                   os.stat(registro_modelos.ruta_encoder(modelo_id)).st_mtime_ns)
+                  for modelo_id in registro_modelos.listar_modelos())
+    if not clave:
+        raise ValueError("No hay modelos entrenados para formar el ensamble.")
+    return _ensamble_en_cache(clave)
@@ -0,0 +1,80 @@
+# indice_real.py
+import os
+import pickle
+
+from datos import cargar_dataset, huella_csv, ruta_cache, columnas_utiles, columna_objetivo, RUTA_CSV
+
+# Índices ya cargados en memoria, por sha1 del CSV
+_indices = {}
+
+
+def clave(valores):
+    """Normaliza una fila (iterable con las 9 columnas útiles) a una clave hashable.
+
+    Los números enteros guardados como float (p. ej. "Arrival Delay in Minutes")
+    se convierten a int para que 15 y 15.0 den la misma clave.
+    """
+    normalizada = []
+    for v in valores:
+        if hasattr(v, "item"):
+            v = v.item()
+        if isinstance(v, float) and v.is_integer():
+            v = int(v)
+        normalizada.append(v)
+    return tuple(normalizada)
+
+
+def construir_indice(csv_path=RUTA_CSV):
+    """Agrupa el dataset por las 9 columnas útiles y cuenta cada etiqueta real."""
+    df = cargar_dataset(csv_path)
+    conteos = df.groupby(columnas_utiles + [columna_objetivo], observed=True, sort=False).size()
+
+    indice = {}
+    for fila, n in conteos.items():
+        etiquetas_fila = indice.setdefault(clave(fila[:-1]), {})
+        etiquetas_fila[str(fila[-1])] = int(n)
+    return indice
+
+
+def cargar_indice(csv_path=RUTA_CSV):
+    """Devuelve el índice del CSV; solo se reconstruye si el CSV cambió."""
+    sha1 = huella_csv(csv_path)["sha1"]
+    if sha1 in _indices:
+        return _indices[sha1]
+
+    ruta = os.path.join(ruta_cache(csv_path), "indice_real.pkl")
+    indice = None
+    if os.path.exists(ruta):
+        with open(ruta, "rb") as f:
+            guardado = pickle.load(f)
+        if guardado.get("sha1") == sha1:
+            indice = guardado["indice"]
+
+    if indice is None:
+        indice = construir_indice(csv_path)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        tmp = ruta + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({"sha1": sha1, "indice": indice}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, ruta)
+
+    _indices.clear()
+    _indices[sha1] = indice
+    return indice
+
+
+def buscar(entrada, csv_path=RUTA_CSV):
+    """Busca la etiqueta real de una entrada (dict columna -> valor).
+
+    Devuelve None si no hay ninguna fila igual; si la hay, un dict con el
+    número de filas que comparten la clave, la etiqueta mayoritaria y los
+    conteos por etiqueta.
+    """
+    conteos = cargar_indice(csv_path).get(clave(entrada[col] for col in columnas_utiles))
+    if not conteos:
+        return None
+    return {
+        "filas": sum(conteos.values()),
+        "mayoritaria": max(conteos, key=conteos.get),
+        "conteos": conteos,
+    }
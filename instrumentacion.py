@@ -0,0 +1,246 @@
+# instrumentacion.py
+import os
+import sys
+import json
+import time
+import atexit
+import logging
+import threading
+import itertools
+import multiprocessing
+from collections import Counter
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+# Destino del log de etapas (JSONL rotativo) y perfilado opcional:
+#   SKYSENSE_LOG_ETAPAS=ruta.jsonl  cambia el archivo (vacío = no escribir)
+#   SKYSENSE_PROFILE=1 | ruta.prof  vuelca perfiles cProfile (del proceso o de cada trabajo)
+RUTA_LOG = os.environ.get("SKYSENSE_LOG_ETAPAS", os.path.join("logs", "etapas.jsonl"))
+TAMANO_MAXIMO = 5 * 1024 * 1024
+N_RESPALDOS = 3
+
+_logger = logging.getLogger("skysense.etapas")
+_logger.propagate = False
+_lock = threading.Lock()
+_contadores = Counter()
+_local = threading.local()
+_pid_logger = None
+_n_perfiles = itertools.count(1)
+_medidores_memoria = []
+
+
+def _ruta_log():
+    # La rotación de RotatingFileHandler no es segura entre procesos: los
+    # procesos de trabajo (ProcessPoolExecutor) escriben cada uno en su archivo.
+    if multiprocessing.parent_process() is None:
+        return RUTA_LOG
+    base, extension = os.path.splitext(RUTA_LOG)
+    return f"{base}_{os.getpid()}{extension}"
+
+
+def _configurar_logger():
+    global _pid_logger
+    if not RUTA_LOG or _pid_logger == os.getpid():
+        return
+    with _lock:
+        if _pid_logger == os.getpid():
+            return
+        # Un proceso creado con fork hereda el manejador del padre: se sustituye
+        for heredado in list(_logger.handlers):
+            _logger.removeHandler(heredado)
+        ruta = _ruta_log()
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        manejador = RotatingFileHandler(ruta, maxBytes=TAMANO_MAXIMO, backupCount=N_RESPALDOS,
+                                        encoding="utf-8")
+        manejador.setFormatter(logging.Formatter("%(message)s"))
+        _logger.addHandler(manejador)
+        _logger.setLevel(logging.INFO)
+        _pid_logger = os.getpid()
+
+
+def rss_actual_mb():
+    """Memoria residente actual del proceso en MB (pico si no se puede leer la actual)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2, 1)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _pico_kernel_mb():
+    # VmHWM: pico de memoria residente que lleva el kernel (Linux)
+    with open("/proc/self/status") as f:
+        for linea in f:
+            if linea.startswith("VmHWM:"):
+                return round(int(linea.split()[1]) / 1024, 1)
+    raise ValueError("VmHWM no disponible")
+
+
+class _PicoMemoria:
+    """Pico de RSS desde que se creó (ver memoria_pico)."""
+
+    def __init__(self, intervalo):
+        self._pico = rss_actual_mb()
+        self._parar = threading.Event()
+        self._hilo = None
+        try:
+            with _lock:
+                # Los medidores abiertos (anidados o de otros hilos) guardan el
+                # pico hasta aquí antes de reiniciarlo; escribir 5 en
+                # clear_refs reinicia VmHWM a la RSS actual.
+                previo = _pico_kernel_mb()
+                for medidor in _medidores_memoria:
+                    medidor._pico = max(medidor._pico, previo)
+                with open("/proc/self/clear_refs", "w") as f:
+                    f.write("5")
+                _medidores_memoria.append(self)
+            self._kernel = True
+        except (OSError, ValueError):
+            self._kernel = False
+            if self._pico is not None:
+                self._hilo = threading.Thread(target=self._muestrear, args=(intervalo,), daemon=True)
+                self._hilo.start()
+
+    def _muestrear(self, intervalo):
+        while not self._parar.wait(intervalo):
+            self._pico = max(self._pico, rss_actual_mb())
+
+    def pico_mb(self):
+        """Pico de RSS en MB hasta ahora (None si no se puede medir)."""
+        if self._kernel:
+            return max(self._pico, _pico_kernel_mb())
+        actual = rss_actual_mb()
+        return None if self._pico is None else max(self._pico, actual)
+
+    def detener(self):
+        if self._kernel:
+            with _lock:
+                _medidores_memoria.remove(self)
+        self._parar.set()
+        if self._hilo is not None:
+            self._hilo.join()
+
+
+@contextmanager
+def memoria_pico(intervalo=0.05):
+    """Mide el pico de memoria residente del bloque: objeto con pico_mb().
+
+    En Linux se reinicia el pico que lleva el kernel (VmHWM) al entrar, así
+    que el valor es el del bloque y no el de toda la vida del proceso (como
+    ru_maxrss). Si no se puede, un hilo muestrea la RSS cada `intervalo` s
+    (puede perder picos más cortos). El pico es del proceso entero: incluye
+    lo que hagan a la vez otros hilos.
+    """
+    medidor = _PicoMemoria(intervalo)
+    try:
+        yield medidor
+    finally:
+        medidor.detener()
+
+
+def registrar(etapa, ms, **campos):
+    """Registra una duración ya medida en el JSONL y en la recolección activa del hilo."""
+    evento = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "pid": os.getpid(), "etapa": etapa,
+              "ms": ms, "rss_mb": rss_actual_mb()}
+    evento.update(campos)
+    recoleccion = getattr(_local, "recoleccion", None)
+    if recoleccion is not None:
+        recoleccion.append((etapa, ms))
+    _configurar_logger()
+    if _logger.handlers:
+        _logger.info(json.dumps(evento, ensure_ascii=False, default=str))
+
+
+@contextmanager
+def medir(etapa, **campos):
+    """Mide la duración de una etapa y la registra (ver registrar)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(etapa, round((time.perf_counter() - inicio) * 1000, 3), **campos)
+
+
+@contextmanager
+def recolectar():
+    """Recoge las etapas medidas en este hilo mientras dure el bloque: lista de (etapa, ms)."""
+    anterior = getattr(_local, "recoleccion", None)
+    _local.recoleccion = []
+    try:
+        yield _local.recoleccion
+    finally:
+        _local.recoleccion = anterior
+
+
+def contar(nombre, n=1):
+    with _lock:
+        _contadores[nombre] += n
+
+
+def contadores():
+    with _lock:
+        return dict(_contadores)
+
+
+def resumen(etapas, ancho=24):
+    """Texto compacto con una línea por etapa, para mostrar al usuario."""
+    return "\n".join(f"⏱️ {etapa:<{ancho}} {ms:>9.1f} ms" for etapa, ms in etapas)
+
+
+def _ruta_perfil(nombre, sufijo=""):
+    destino = os.environ.get("SKYSENSE_PROFILE")
+    if not destino:
+        return None
+    if destino in ("1", "true", "si"):
+        destino = os.path.join("logs", f"perfil_{nombre}_{os.getpid()}{sufijo}.prof")
+    elif sufijo:
+        base, extension = os.path.splitext(destino)
+        destino = f"{base}_{nombre}{sufijo}{extension or '.prof'}"
+    os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+    return destino
+
+
+@contextmanager
+def perfilar(nombre):
+    """Si SKYSENSE_PROFILE está definida, perfila el bloque en el hilo actual y lo vuelca al terminar.
+
+    cProfile solo perfila el hilo que lo activa: los trabajos que corren en
+    hilos propios (p. ej. los de la interfaz) se envuelven con esto.
+    """
+    destino = _ruta_perfil(nombre, f"_{next(_n_perfiles)}")
+    if destino is None:
+        yield
+        return
+    import cProfile
+    perfil = cProfile.Profile()
+    perfil.enable()
+    try:
+        yield
+    finally:
+        perfil.disable()
+        perfil.dump_stats(destino)
+        print(f"🧪 Perfil cProfile guardado en {destino}")
+
+
+def perfil_desde_entorno(nombre):
+    """Si SKYSENSE_PROFILE está definida, perfila el hilo principal con cProfile y lo vuelca al salir."""
+    destino = _ruta_perfil(nombre)
+    if destino is None:
+        return None
+    import cProfile
+    perfil = cProfile.Profile()
+    perfil.enable()
+
+    def volcar():
+        perfil.disable()
+        perfil.dump_stats(destino)
+        print(f"🧪 Perfil cProfile guardado en {destino}")
+
+    atexit.register(volcar)
+    return perfil
@@ -1,104 +1,220 @@
+import time
+INICIO_ARRANQUE = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, messagebox
-import pandas as pd
-import joblib
 import os
-from utils_model import entrenar_modelo
+import sys
+import json
+import queue
+import threading
+from instrumentacion import medir, recolectar, resumen, perfilar, registrar
+
+# pandas y scikit-learn (a través de registro_modelos, ensamble, indice_real,
+# datos y utils_model) se importan al usarse o en el hilo de precarga, para
+# que la ventana aparezca sin esperarlos.
+RUTA_LOGO = os.path.join("imagen", "logo.jpeg")
+RUTA_LOGO_CACHE = os.path.join("imagen", ".cache", "logo_240.png")
+TAMANO_LOGO = (240, 240)
 
 # ================================
-#  Función principal
+#  Arranque rápido
 # ================================
-def predecir_y_entrenar():
+arranque = {}
+precarga_lista = threading.Event()
+
+def precargar_modulos():
+    """Importa los módulos de ML y carga el modelo actual en segundo plano."""
     try:
-        # Mostrar indicador de carga
-        loading_label.config(text="🔄 Analizando datos...", fg="#e67e22")
-        root.update()
-        
-        # Validar campos numéricos
+        with perfilar("precarga"), recolectar() as etapas:
+            with medir("precargar_modulos_ml"):
+                import registro_modelos
+                import ensamble  # noqa: F401
+                import indice_real
+            if registro_modelos.modelo_actual_id() is not None:
+                registro_modelos.cargar()
+            from datos import RUTA_CSV
+            with medir("precargar_indice_real"):
+                indice_real.cargar_indice(RUTA_CSV)
+        arranque.update({etapa: ms for etapa, ms in etapas})
+    except Exception as e:
+        print(f"⚠️ Precarga incompleta: {e}")
+    finally:
+        precarga_lista.set()
+
+def marcar_ventana_visible():
+    root.update_idletasks()
+    ms = round((time.perf_counter() - INICIO_ARRANQUE) * 1000, 3)
+    arranque["ventana_visible"] = ms
+    registrar("arranque_ventana_visible", ms)
+    loading_label.config(text=f"🚀 Sistema listo para analizar (arranque {ms:.0f} ms)")
+
+def informar_arranque():
+    """Modo --medir-arranque: imprime los tiempos en JSON y cierra cuando la precarga termina."""
+    if not precarga_lista.is_set():
+        root.after(20, informar_arranque)
+        return
+    arranque["modulos_listos"] = round((time.perf_counter() - INICIO_ARRANQUE) * 1000, 3)
+    print(json.dumps(arranque))
+    root.destroy()
+
+# ================================
+#  Trabajo en segundo plano
+# ================================
+# Los hilos de trabajo nunca tocan widgets: envían eventos a esta cola y
+# procesar_eventos() los atiende desde el bucle de Tk con root.after.
+cola_eventos = queue.Queue()
+cancelar_evento = None
+
+def establecer_ocupado(ocupado, cancelable=False):
+    estado = ["disabled"] if ocupado else ["!disabled"]
+    predict_btn.state(estado)
+    sensitivity_btn.state(estado)
+    train_btn.state(estado)
+    cancel_btn.state(["!disabled"] if ocupado and cancelable else ["disabled"])
+    if not ocupado:
+        progress_bar["value"] = 0
+
+def ejecutar_en_segundo_plano(trabajo, al_terminar, al_fallar, cancelable=False):
+    """Ejecuta trabajo() en un hilo y entrega su resultado a al_terminar/al_fallar en el hilo de Tk."""
+    def hilo():
         try:
-            edad = int(edad_var.get())
-            distancia = int(distancia_var.get())
-            entretenimiento = int(entretenimiento_var.get())
-            servicio_bordo = int(servicio_bordo_var.get())
-            limpieza = int(limpieza_var.get())
-            llegada = int(llegada_var.get())
-            salida = int(salida_var.get())
-        except ValueError:
-            loading_label.config(text=" Error en los datos", fg="#e74c3c")
-            messagebox.showerror(" Error de Validación", "Por favor, ingrese valores numéricos válidos en todos los campos")
-            return
+            # Con SKYSENSE_PROFILE, un perfil por trabajo (cProfile no ve otros hilos)
+            with perfilar(trabajo.__qualname__.split(".")[0]):
+                resultado = trabajo()
+            cola_eventos.put(("fin", al_terminar, resultado))
+        except Exception as e:
+            cola_eventos.put(("fin", al_fallar, e))
 
-        # Validar rangos
-        if not (18 <= edad <= 100):
-            loading_label.config(text=" Edad inválida", fg="#e74c3c")
-            messagebox.showerror(" Error de Validación", "La edad debe estar entre 18 y 100 años")
-            return
-            
-        if not (0 <= entretenimiento <= 5) or not (0 <= servicio_bordo <= 5) or not (0 <= limpieza <= 5):
-            loading_label.config(text=" Valores fuera de rango", fg="#e74c3c")
-            messagebox.showerror(" Error de Validación", "Los valores de satisfacción deben estar entre 0 y 5")
-            return
+    establecer_ocupado(True, cancelable)
+    threading.Thread(target=hilo, daemon=True).start()
 
-        id_modelo = len([f for f in os.listdir("models") if f.startswith("model_")]) + 1
-        entrenar_modelo("data/Airline_customer_satisfaction.csv", id_modelo)
-
-        model = joblib.load(f"models/model_{id_modelo}.pkl")
-        encoders = joblib.load(f"encoders/encoder_{id_modelo}.pkl")
-
-        entrada = {
-            "Age": edad,
-            "Type of Travel": tipo_viaje_var.get(),
-            "Class": clase_var.get(),
-            "Flight Distance": distancia,
-            "Inflight entertainment": entretenimiento,
-            "On-board service": servicio_bordo,
-            "Cleanliness": limpieza,
-            "Arrival Delay in Minutes": llegada,
-            "Departure Delay in Minutes": salida
-        }
-
-        df_input = pd.DataFrame([entrada])
-        for col in df_input.columns:
-            if col in encoders:
-                le = encoders[col]
-                df_input[col] = df_input[col].apply(lambda x: le.transform([x])[0] if x in le.classes_ else -1)
-
-        df_input = df_input[model.feature_names_in_]
-        pred = model.predict(df_input)[0]
-        resultado = "SATISFECHO" if pred == 1 else "INSATISFECHO"
-        icono_resultado = "😊" if pred == 1 else "😞"
-
-        df_csv = pd.read_csv("data/Airline_customer_satisfaction.csv")
-        match = df_csv[
-            (df_csv["Age"] == edad) &
-            (df_csv["Type of Travel"] == tipo_viaje_var.get()) &
-            (df_csv["Class"] == clase_var.get()) &
-            (df_csv["Flight Distance"] == distancia) &
-            (df_csv["Inflight entertainment"] == entretenimiento) &
-            (df_csv["On-board service"] == servicio_bordo) &
-            (df_csv["Cleanliness"] == limpieza) &
-            (df_csv["Arrival Delay in Minutes"] == llegada) &
-            (df_csv["Departure Delay in Minutes"] == salida)
-        ]
-
-        if not match.empty:
-            real = match.iloc[0]["satisfaction"]
-            coincide = (real == "satisfied" and pred == 1) or (real != "satisfied" and pred == 0)
-            precision = "ALTA PRECISIÓN" if coincide else "DIVERGENCIA DETECTADA"
-            
-            mensaje = f"""
+def procesar_eventos():
+    try:
+        while True:
+            evento = cola_eventos.get_nowait()
+            if evento[0] == "progreso":
+                _, hechos, total = evento
+                progress_bar["maximum"] = total
+                progress_bar["value"] = hechos
+                loading_label.config(text=f"🌲 Entrenando modelo... {hechos}/{total} árboles", fg="#e67e22")
+            elif evento[0] == "fin":
+                _, callback, valor = evento
+                establecer_ocupado(False)
+                callback(valor)
+    except queue.Empty:
+        pass
+    root.after(100, procesar_eventos)
+
+# ================================
+#  Función principal
+# ================================
+def leer_formulario():
+    """Valida el formulario y devuelve (entrada, usar_ensamble), o None tras avisar del error."""
+    # Validar campos numéricos
+    try:
+        edad = int(edad_var.get())
+        distancia = int(distancia_var.get())
+        entretenimiento = int(entretenimiento_var.get())
+        servicio_bordo = int(servicio_bordo_var.get())
+        limpieza = int(limpieza_var.get())
+        llegada = int(llegada_var.get())
+        salida = int(salida_var.get())
+    except ValueError:
+        loading_label.config(text=" Error en los datos", fg="#e74c3c")
+        messagebox.showerror(" Error de Validación", "Por favor, ingrese valores numéricos válidos en todos los campos")
+        return None
+
+    # Validar rangos
+    if not (18 <= edad <= 100):
+        loading_label.config(text=" Edad inválida", fg="#e74c3c")
+        messagebox.showerror(" Error de Validación", "La edad debe estar entre 18 y 100 años")
+        return None
+        
+    if not (0 <= entretenimiento <= 5) or not (0 <= servicio_bordo <= 5) or not (0 <= limpieza <= 5):
+        loading_label.config(text=" Valores fuera de rango", fg="#e74c3c")
+        messagebox.showerror(" Error de Validación", "Los valores de satisfacción deben estar entre 0 y 5")
+        return None
+
+    usar_ensamble = usar_ensamble_var.get()
+    entrada = {
+        "Age": edad,
+        "Type of Travel": tipo_viaje_var.get(),
+        "Class": clase_var.get(),
+        "Flight Distance": distancia,
+        "Inflight entertainment": entretenimiento,
+        "On-board service": servicio_bordo,
+        "Cleanliness": limpieza,
+        "Arrival Delay in Minutes": llegada,
+        "Departure Delay in Minutes": salida
+    }
+    return entrada, usar_ensamble
+
+class ModeloNoDisponible(Exception):
+    """No hay modelo actual para una predicción sin ensamble."""
+
+def comprobar_modelo(usar_ensamble):
+    # Se llama desde los hilos de trabajo: importar registro_modelos (scikit-learn)
+    # en el hilo de Tk congelaría la ventana mientras la precarga no termine.
+    import registro_modelos
+    if not usar_ensamble and registro_modelos.modelo_actual_id() is None:
+        raise ModeloNoDisponible("Todavía no hay un modelo entrenado.\nPulse \"ENTRENAR MODELO\" primero.")
+
+def analizar_satisfaccion():
+    formulario = leer_formulario()
+    if formulario is None:
+        return
+    entrada, usar_ensamble = formulario
+
+    def trabajo():
+        comprobar_modelo(usar_ensamble)
+        import registro_modelos
+        import ensamble
+        import indice_real
+        from datos import RUTA_CSV
+        # Las etapas medidas en este hilo se muestran junto al resultado
+        with recolectar() as etapas, medir("analisis_total", ensamble=usar_ensamble):
+            if usar_ensamble:
+                with medir("cargar_ensamble"):
+                    ens = ensamble.ensamble_registro()
+                with medir("predecir_ensamble", miembros=len(ens.miembros)):
+                    pred, _ = ens.predecir_fila(entrada)
+                id_modelo = f"ENSAMBLE ({len(ens.miembros)} modelos)"
+            else:
+                pred, _, id_modelo = registro_modelos.predecir(entrada)
+            with medir("buscar_valor_real"):
+                match = indice_real.buscar(entrada, RUTA_CSV)
+        return pred, id_modelo, match, etapas
+
+    # Mostrar indicador de carga
+    loading_label.config(text="🔄 Analizando datos...", fg="#e67e22")
+    ejecutar_en_segundo_plano(trabajo, mostrar_resultado, mostrar_error_analisis)
+
+def mostrar_resultado(resultado_analisis):
+    pred, id_modelo, match, etapas = resultado_analisis
+    resultado = "SATISFECHO" if pred == 1 else "INSATISFECHO"
+    icono_resultado = "😊" if pred == 1 else "😞"
+
+    if match is not None:
+        real = match["mayoritaria"]
+        filas_real = f"{match['filas']} fila(s), " + ", ".join(f"{k}: {v}" for k, v in match["conteos"].items())
+        coincide = (real == "satisfied" and pred == 1) or (real != "satisfied" and pred == 0)
+        precision = "ALTA PRECISIÓN" if coincide else "DIVERGENCIA DETECTADA"
+        
+        mensaje = f"""
 ╔══════════════════════════════════════════════════════╗
 ║                  📊 ANÁLISIS COMPLETO                ║
 ╠══════════════════════════════════════════════════════╣
 ║  🎯 PREDICCIÓN: {resultado} {icono_resultado}        ║
 ║  📈 VALOR REAL: {real.upper():<30}                   ║
+║  📚 COINCIDENCIAS: {filas_real:<30}               ║
 ║  🔍 PRECISIÓN: {precision:<30}                       ║
 ║  🤖 MODELO ID: #{id_modelo:<35}                      ║
 ║  ⚡ CONFIANZA: {'ALTA' if coincide else 'MEDIA':<33} ║
 ╚══════════════════════════════════════════════════════╝
 """
-        else:
-            mensaje = f"""
+    else:
+        mensaje = f"""
 ╔══════════════════════════════════════════════════════╗
 ║                  📊 ANÁLISIS COMPLETO                ║
 ╠══════════════════════════════════════════════════════╣
@@ -106,13 +222,91 @@ def predecir_y_entrenar():
 ║  🤖 MODELO ID: #{id_modelo:<35}                     ║
 ╚══════════════════════════════════════════════════════╝
 """
-        
-        loading_label.config(text=" Análisis completado exitosamente", fg="#27ae60")
-        messagebox.showinfo("🎉 Resultado del Análisis", mensaje)
+    
+    mensaje += "\n" + resumen(etapas)
+
+    loading_label.config(text=" Análisis completado exitosamente", fg="#27ae60")
+    messagebox.showinfo("🎉 Resultado del Análisis", mensaje)
+
+def analizar_sensibilidad():
+    """Qué pasaría si: limpieza (0-5) x retraso de salida, puntuado en una sola llamada."""
+    formulario = leer_formulario()
+    if formulario is None:
+        return
+    entrada, usar_ensamble = formulario
+
+    def trabajo():
+        comprobar_modelo(usar_ensamble)
+        import sensibilidad
+        proba_base, tabla = sensibilidad.analizar(entrada, ["Cleanliness", "Departure Delay in Minutes"],
+                                                  usar_ensamble=usar_ensamble)
+        return proba_base, sensibilidad.matriz_deltas(tabla)
+
+    def al_terminar(resultado):
+        proba_base, matriz = resultado
+        loading_label.config(text=" Análisis de sensibilidad completado", fg="#27ae60")
+        ventana = tk.Toplevel(root)
+        ventana.title("🔬 Sensibilidad de la predicción")
+        texto = tk.Text(ventana, font=("Consolas", 10), width=90, height=len(matriz) + 8, bg="#ffffff")
+        texto.insert("end", f"P(satisfecho) actual: {proba_base:.3f}\n"
+                            f"Cambio al variar limpieza (filas) y retraso de salida en minutos (columnas):\n\n")
+        texto.insert("end", matriz.map(lambda d: f"{d:+.3f}").to_string())
+        texto.config(state="disabled")
+        texto.pack(padx=10, pady=10)
+
+    loading_label.config(text="🔬 Calculando sensibilidad...", fg="#e67e22")
+    ejecutar_en_segundo_plano(trabajo, al_terminar, mostrar_error_analisis)
+
+def mostrar_error_analisis(e):
+    if isinstance(e, ModeloNoDisponible):
+        loading_label.config(text=" Sin modelo entrenado", fg="#e74c3c")
+        messagebox.showwarning(" Modelo no disponible", str(e))
+        return
+    loading_label.config(text=" Error en el sistema", fg="#e74c3c")
+    messagebox.showerror(" Error del Sistema", f"Se produjo un error durante el análisis:\n\n{str(e)}")
+
+def entrenar_nuevo_modelo():
+    global cancelar_evento
+    cancelar_evento = threading.Event()
+
+    def progreso(hechos, total):
+        cola_eventos.put(("progreso", hechos, total))
+
+    def trabajo():
+        import registro_modelos
+        from datos import RUTA_CSV
+        existentes = set(registro_modelos.listar_modelos())
+        id_modelo = registro_modelos.entrenar(RUTA_CSV, progreso=progreso, cancelar=cancelar_evento,
+                                              incremental=True)
+        return id_modelo, id_modelo in existentes
+
+    def al_terminar(resultado):
+        import registro_modelos
+        id_modelo, reutilizado = resultado
+        meta = registro_modelos.leer_metadatos(id_modelo) or {}
+        if reutilizado:
+            texto = f" Datos sin cambios: se reutiliza el modelo #{id_modelo}"
+        elif meta.get("modo") == "incremental":
+            texto = f" Modelo #{id_modelo} ampliado con las filas nuevas y activo"
+        else:
+            texto = f" Modelo #{id_modelo} entrenado y activo"
+        loading_label.config(text=texto, fg="#27ae60")
 
-    except Exception as e:
-        loading_label.config(text=" Error en el sistema", fg="#e74c3c")
-        messagebox.showerror(" Error del Sistema", f"Se produjo un error durante el análisis:\n\n{str(e)}")
+    def al_fallar(e):
+        from utils_model import EntrenamientoCancelado
+        if isinstance(e, EntrenamientoCancelado):
+            loading_label.config(text=" Entrenamiento cancelado", fg="#f39c12")
+            return
+        loading_label.config(text=" Error en el entrenamiento", fg="#e74c3c")
+        messagebox.showerror(" Error del Sistema", f"Se produjo un error durante el entrenamiento:\n\n{str(e)}")
+
+    loading_label.config(text="🔄 Entrenando modelo...", fg="#e67e22")
+    ejecutar_en_segundo_plano(trabajo, al_terminar, al_fallar, cancelable=True)
+
+def cancelar_trabajo():
+    if cancelar_evento is not None:
+        cancelar_evento.set()
+        loading_label.config(text="⏳ Cancelando entrenamiento...", fg="#f39c12")
 
 def limpiar_campos():
     """Función para limpiar todos los campos del formulario"""
@@ -212,6 +406,7 @@ servicio_bordo_var = tk.StringVar(value="3")
 limpieza_var = tk.StringVar(value="3")
 llegada_var = tk.StringVar(value="15")
 salida_var = tk.StringVar(value="10")
+usar_ensamble_var = tk.BooleanVar(value=False)
 
 # ================================
 #  Estructura principal
@@ -251,21 +446,30 @@ right_frame.pack_propagate(False)
 logo_container = tk.Frame(right_frame, bg="#ffffff")
 logo_container.pack(fill="both", expand=True, padx=20, pady=20)
 
+def logo_en_cache(origen=RUTA_LOGO, destino=RUTA_LOGO_CACHE):
+    """PNG ya redimensionado del logo; PIL solo se usa si falta o el original cambió."""
+    if not os.path.exists(destino) or os.path.getmtime(destino) < os.path.getmtime(origen):
+        from PIL import Image
+        img = Image.open(origen)
+        # Redimensionar manteniendo proporción
+        img.thumbnail(TAMANO_LOGO, Image.Resampling.LANCZOS)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        tmp = destino + ".tmp.png"
+        img.save(tmp)
+        os.replace(tmp, destino)
+    return destino
+
 # Cargar logo desde el backend
 def cargar_logo_backend():
     """Función para cargar el logo desde el backend del sistema"""
     try:
         # Ruta del logo en el backend
-        logo_path = "imagen/logo.jpeg"  # Ruta específica solicitada
+        logo_path = RUTA_LOGO
         
         # Verificar si existe el archivo
         if os.path.exists(logo_path):
-            # Cargar imagen con PIL
-            from PIL import Image, ImageTk
-            img = Image.open(logo_path)
-            # Redimensionar manteniendo proporción
-            img.thumbnail((240, 240), Image.Resampling.LANCZOS)
-            logo_img = ImageTk.PhotoImage(img)
+            # Tk muestra el PNG en caché directamente, sin decodificar el JPEG
+            logo_img = tk.PhotoImage(file=logo_en_cache(logo_path))
             
             # Mostrar imagen en el label
             logo_label = tk.Label(logo_container, image=logo_img, bg="#ffffff")
@@ -397,10 +601,19 @@ for i, (label, var, options, tooltip) in enumerate(campos_config):
 for i in range(3):
     form_container.grid_columnconfigure(i, weight=1)
 
+# Opción de predicción con el ensamble de todos los modelos
+ensamble_check = tk.Checkbutton(main_container,
+                               text="🤝 Usar ensamble de todos los modelos",
+                               variable=usar_ensamble_var,
+                               font=("Segoe UI", 10),
+                               bg="#ffffff", fg="#2c3e50",
+                               activebackground="#ffffff")
+ensamble_check.pack(anchor="w", padx=20)
+
 # ================================
 #  Estado del sistema
 # ================================
-status_frame = tk.Frame(main_container, bg="#ecf0f1", height=40)
+status_frame = tk.Frame(main_container, bg="#ecf0f1", height=64)
 status_frame.pack(fill="x", pady=(10, 0))
 status_frame.pack_propagate(False)
 
@@ -408,7 +621,10 @@ loading_label = tk.Label(status_frame,
                         text="🚀 Sistema listo para analizar",
                         font=("Segoe UI", 10, "bold"),
                         bg="#ecf0f1", fg="#3498db")
-loading_label.pack(pady=12)
+loading_label.pack(pady=(10, 4))
+
+progress_bar = ttk.Progressbar(status_frame, orient="horizontal", mode="determinate", length=300)
+progress_bar.pack()
 
 # ================================
 #  Panel de botones
@@ -423,10 +639,32 @@ button_container.pack(expand=True)
 # Botón principal
 predict_btn = ttk.Button(button_container, 
                         text="🚀 ANALIZAR SATISFACCIÓN", 
-                        command=predecir_y_entrenar, 
+                        command=analizar_satisfaccion, 
                         style="Primary.TButton")
 predict_btn.pack(side="left", padx=10)
 
+# Botón de análisis de sensibilidad (qué pasaría si)
+sensitivity_btn = ttk.Button(button_container, 
+                            text="🔬 SENSIBILIDAD", 
+                            command=analizar_sensibilidad, 
+                            style="Primary.TButton")
+sensitivity_btn.pack(side="left", padx=10)
+
+# Botón de entrenamiento (solo bajo petición explícita)
+train_btn = ttk.Button(button_container, 
+                      text="🔁 ENTRENAR MODELO", 
+                      command=entrenar_nuevo_modelo, 
+                      style="Primary.TButton")
+train_btn.pack(side="left", padx=10)
+
+# Botón para cancelar un entrenamiento en curso
+cancel_btn = ttk.Button(button_container, 
+                       text="⛔ CANCELAR", 
+                       command=cancelar_trabajo, 
+                       style="Warning.TButton")
+cancel_btn.pack(side="left", padx=10)
+cancel_btn.state(["disabled"])
+
 # Botón de limpiar
 clear_btn = ttk.Button(button_container, 
                       text="🧹 LIMPIAR DATOS", 
@@ -438,4 +676,9 @@ clear_btn.pack(side="left", padx=10)
 #  Iniciar aplicación
 # ================================
 if __name__ == "__main__":
+    threading.Thread(target=precargar_modulos, daemon=True).start()
+    root.after(0, marcar_ventana_visible)
+    if "--medir-arranque" in sys.argv:
+        root.after(0, informar_arranque)
+    root.after(100, procesar_eventos)
     root.mainloop()
\ No newline at end of file
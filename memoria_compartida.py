@@ -0,0 +1,49 @@
+# memoria_compartida.py
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Arrays adjuntados en un proceso de trabajo (ver iniciar_trabajador) y sus
+# segmentos, que deben seguir abiertos mientras se usen los arrays
+_arrays = ()
+_memorias = []
+
+
+def compartir(array):
+    """Copia el array a un segmento de memoria compartida.
+
+    Devuelve (memoria, descriptor): el descriptor (nombre, forma, tipo) es lo
+    único que se envía a los procesos de trabajo. Quien crea el segmento debe
+    llamar a memoria.close() y memoria.unlink() al terminar.
+    """
+    memoria = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=memoria.buf)[:] = array
+    return memoria, (memoria.name, array.shape, array.dtype.str)
+
+
+def adjuntar(descriptor):
+    """Abre el segmento de un descriptor sin copiarlo. Devuelve (memoria, array)."""
+    nombre, forma, tipo = descriptor
+    # Los trabajadores comparten el resource_tracker del proceso principal,
+    # que es quien libera el segmento (unlink) al terminar.
+    memoria = shared_memory.SharedMemory(name=nombre)
+    return memoria, np.ndarray(forma, dtype=np.dtype(tipo), buffer=memoria.buf)
+
+
+def iniciar_trabajador(*descriptores):
+    """Inicializador de ProcessPoolExecutor: adjunta los arrays de los descriptores (ver matrices)."""
+    global _arrays, _memorias
+    adjuntos = [adjuntar(descriptor) for descriptor in descriptores]
+    _memorias = [memoria for memoria, _ in adjuntos]
+    _arrays = tuple(array for _, array in adjuntos)
+
+
+def matrices():
+    """Arrays adjuntados por iniciar_trabajador, en el orden de sus descriptores."""
+    return _arrays
+
+
+def liberar(*memorias):
+    for memoria in memorias:
+        memoria.close()
+        memoria.unlink()
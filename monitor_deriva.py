@@ -0,0 +1,217 @@
+# monitor_deriva.py
+import sys
+import json
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from datos import columnas_utiles, tipos_columnas
+from almacen_modelos import leer_metadatos
+
+N_INTERVALOS = 10
+N_CUANTILES = 100
+# Proporción mínima por intervalo en el PSI (evita log(0) con intervalos vacíos)
+EPSILON = 1e-4
+
+# Umbrales de alerta
+PSI_MODERADO = 0.1
+PSI_ALTO = 0.25
+KS_ALTO = 0.1
+AUMENTO_NULOS = 0.02
+DESCONOCIDAS_MAX = 0.0
+
+
+def _es_categorica(perfil_col):
+    return perfil_col["tipo"] == "categorica"
+
+
+def perfil_referencia(df):
+    """Estadísticas de referencia por columna, calculadas una vez al entrenar.
+
+    Numéricas: tasa de nulos, bordes de N_INTERVALOS intervalos por cuantiles
+    con la proporción de filas en cada uno (para el PSI) y la función de
+    distribución en N_CUANTILES+1 puntos (para el KS). Categóricas: tasa de
+    nulos y proporción de cada categoría. Todo es JSON serializable para
+    guardarlo en los metadatos del modelo.
+    """
+    columnas = {}
+    for col in columnas_utiles:
+        serie = df[col]
+        nulos = float(serie.isna().mean())
+        if isinstance(serie.dtype, pd.CategoricalDtype) or serie.dtype == object:
+            proporciones = serie.dropna().astype(str).value_counts(normalize=True)
+            columnas[col] = {"tipo": "categorica", "nulos": nulos,
+                             "proporciones": {k: float(v) for k, v in proporciones.items()}}
+            continue
+
+        valores = np.sort(serie.dropna().to_numpy(dtype=np.float64))
+        if len(valores) == 0:
+            raise ValueError(f"La columna '{col}' no tiene valores para calcular el perfil.")
+        # Bordes interiores únicos: las columnas discretas (valoraciones 0-5)
+        # quedan con un intervalo por valor
+        bordes = np.unique(np.quantile(valores, np.linspace(0, 1, N_INTERVALOS + 1))[1:-1])
+        conteos = np.bincount(np.searchsorted(bordes, valores, side="right"), minlength=len(bordes) + 1)
+        puntos = np.unique(np.quantile(valores, np.linspace(0, 1, N_CUANTILES + 1)))
+        columnas[col] = {
+            "tipo": "numerica",
+            "nulos": nulos,
+            "bordes": bordes.tolist(),
+            "proporciones": (conteos / len(valores)).tolist(),
+            "puntos": puntos.tolist(),
+            "distribucion": (np.searchsorted(valores, puntos, side="right") / len(valores)).tolist(),
+            "min": float(valores[0]),
+            "max": float(valores[-1]),
+            "media": float(valores.mean()),
+        }
+    return {"filas": len(df), "columnas": columnas}
+
+
+def psi(referencia, actual):
+    """Population Stability Index entre dos vectores de proporciones."""
+    referencia = np.clip(np.asarray(referencia, dtype=np.float64), EPSILON, None)
+    actual = np.clip(np.asarray(actual, dtype=np.float64), EPSILON, None)
+    return float(np.sum((actual - referencia) * np.log(actual / referencia)))
+
+
+class AcumuladorDeriva:
+    """Acumula, bloque a bloque, los conteos necesarios para comparar con el perfil.
+
+    Por bloque solo se hacen operaciones vectorizadas (searchsorted, bincount,
+    value_counts) y se guardan conteos, así que la memoria no depende del
+    número de filas y el coste es casi el de leer el bloque.
+    """
+
+    def __init__(self, perfil):
+        self.perfil = perfil
+        self.filas = 0
+        self.nulos = {col: 0 for col in perfil["columnas"]}
+        self.conteos = {}
+        for col, p in perfil["columnas"].items():
+            if _es_categorica(p):
+                self.conteos[col] = {}
+            else:
+                self.conteos[col] = {"intervalos": np.zeros(len(p["bordes"]) + 1, dtype=np.int64),
+                                     "distribucion": np.zeros(len(p["puntos"]), dtype=np.int64),
+                                     "validos": 0}
+
+    def actualizar(self, bloque):
+        self.filas += len(bloque)
+        for col, p in self.perfil["columnas"].items():
+            serie = bloque[col]
+            nulos = serie.isna()
+            self.nulos[col] += int(nulos.sum())
+            if _es_categorica(p):
+                for valor, n in serie[~nulos].astype(str).value_counts().items():
+                    self.conteos[col][valor] = self.conteos[col].get(valor, 0) + int(n)
+                continue
+            valores = np.sort(serie[~nulos].to_numpy(dtype=np.float64))
+            c = self.conteos[col]
+            c["intervalos"] += np.bincount(np.searchsorted(p["bordes"], valores, side="right"),
+                                           minlength=len(c["intervalos"]))
+            c["distribucion"] += np.searchsorted(valores, p["puntos"], side="right")
+            c["validos"] += len(valores)
+
+    def informe(self):
+        """Una entrada por columna con PSI, KS, nulos, categorías desconocidas y alertas."""
+        resultado = []
+        for col, p in self.perfil["columnas"].items():
+            nulos = self.nulos[col] / max(self.filas, 1)
+            fila = {"columna": col, "nulos_referencia": round(p["nulos"], 4), "nulos": round(nulos, 4),
+                    "psi": None, "ks": None, "desconocidas": None, "alertas": []}
+            if _es_categorica(p):
+                conteos = self.conteos[col]
+                total = max(sum(conteos.values()), 1)
+                categorias = sorted(set(p["proporciones"]) | set(conteos))
+                fila["psi"] = psi([p["proporciones"].get(c, 0.0) for c in categorias],
+                                  [conteos.get(c, 0) / total for c in categorias])
+                nuevas = {c: n for c, n in conteos.items() if c not in p["proporciones"]}
+                fila["desconocidas"] = round(sum(nuevas.values()) / total, 4)
+                if fila["desconocidas"] > DESCONOCIDAS_MAX:
+                    ejemplos = ", ".join(sorted(nuevas, key=nuevas.get, reverse=True)[:3])
+                    fila["alertas"].append(f"categorías no vistas al entrenar ({ejemplos}): se codifican como -1")
+            else:
+                c = self.conteos[col]
+                validos = max(c["validos"], 1)
+                fila["psi"] = psi(p["proporciones"], c["intervalos"] / validos)
+                fila["ks"] = round(float(np.max(np.abs(c["distribucion"] / validos
+                                                       - np.asarray(p["distribucion"])))), 4)
+                if fila["ks"] > KS_ALTO:
+                    fila["alertas"].append(f"KS {fila['ks']:.3f} > {KS_ALTO}")
+            fila["psi"] = round(fila["psi"], 4)
+            if fila["psi"] > PSI_ALTO:
+                fila["alertas"].append(f"deriva alta (PSI {fila['psi']:.3f})")
+            elif fila["psi"] > PSI_MODERADO:
+                fila["alertas"].append(f"deriva moderada (PSI {fila['psi']:.3f})")
+            if nulos - p["nulos"] > AUMENTO_NULOS:
+                fila["alertas"].append(f"nulos {nulos:.1%} (referencia {p['nulos']:.1%})")
+            resultado.append(fila)
+        return resultado
+
+
+def perfil_del_modelo(modelo_id):
+    metadatos = leer_metadatos(modelo_id) or {}
+    if "perfil_datos" not in metadatos:
+        raise ValueError(f"El modelo {modelo_id} no tiene perfil de referencia: vuelva a entrenarlo.")
+    return metadatos["perfil_datos"]
+
+
+def comparar(perfil, df):
+    """Compara un DataFrame completo con el perfil (un único bloque)."""
+    acumulador = AcumuladorDeriva(perfil)
+    acumulador.actualizar(df)
+    return acumulador.informe()
+
+
+def comparar_csv(csv_path, perfil, chunksize=100_000):
+    """Compara un CSV con el perfil leyéndolo por bloques. Devuelve (filas, informe)."""
+    encabezado = pd.read_csv(csv_path, nrows=0).columns
+    for col in columnas_utiles:
+        if col not in encabezado:
+            raise ValueError(f"La columna '{col}' no está en el archivo CSV.")
+    tipos = {col: ("category" if tipos_columnas[col] == "category" else "float32") for col in columnas_utiles}
+    acumulador = AcumuladorDeriva(perfil)
+    for bloque in pd.read_csv(csv_path, usecols=columnas_utiles, dtype=tipos, chunksize=chunksize):
+        acumulador.actualizar(bloque)
+    return acumulador.filas, acumulador.informe()
+
+
+def imprimir_informe(informe, filas=None):
+    if filas is not None:
+        print(f"📋 {filas:,} filas comparadas con el perfil de entrenamiento")
+    print(f"   {'columna':<28} {'PSI':>7} {'KS':>7} {'nulos':>7} {'ref':>7}")
+    for fila in informe:
+        ks = f"{fila['ks']:.3f}" if fila["ks"] is not None else "-"
+        marca = "⚠️" if fila["alertas"] else "✅"
+        print(f"{marca} {fila['columna']:<28} {fila['psi']:>7.3f} {ks:>7} "
+              f"{fila['nulos']:>7.2%} {fila['nulos_referencia']:>7.2%}")
+        for alerta in fila["alertas"]:
+            print(f"      ⚠️ {alerta}")
+    alertas = sum(len(f["alertas"]) for f in informe)
+    print(f"{'🚨' if alertas else '✅'} {alertas} alerta(s)")
+    return alertas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara datos nuevos con el perfil de entrenamiento de un modelo.")
+    parser.add_argument("csv", help="CSV de pasajeros a revisar")
+    parser.add_argument("--modelo", type=int, default=None, help="Id del modelo (por defecto, el actual)")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="Filas por bloque")
+    parser.add_argument("--salida", help="Guarda el informe en JSON")
+    parser.add_argument("--estricto", action="store_true", help="Termina con código 1 si hay alertas")
+    args = parser.parse_args()
+
+    import registro_modelos
+    modelo_id = args.modelo if args.modelo is not None else registro_modelos.modelo_actual_id()
+    filas, informe = comparar_csv(args.csv, perfil_del_modelo(modelo_id), args.chunksize)
+    alertas = imprimir_informe(informe, filas)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump({"modelo_id": modelo_id, "filas": filas, "columnas": informe}, f, indent=2, ensure_ascii=False)
+        print(f"✅ Informe en {args.salida}")
+    if args.estricto and alertas:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
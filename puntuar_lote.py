@@ -0,0 +1,78 @@
+# puntuar_lote.py
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import registro_modelos
+import monitor_deriva
+from datos import columnas_utiles, tipos_columnas
+
+
+def puntuar_csv(entrada, salida, modelo_id=None, chunksize=100_000, conservar=(), monitor=None):
+    """Puntúa un CSV por bloques y escribe las predicciones de forma incremental.
+
+    Solo se mantiene en memoria un bloque a la vez, así que el consumo no
+    depende del tamaño del archivo. Devuelve el número de filas puntuadas.
+    monitor: AcumuladorDeriva opcional que recibe cada bloque leído.
+    """
+    model, codificador = registro_modelos.cargar(modelo_id)
+    columnas_modelo = list(model.feature_names_in_)
+    indice_positivo = list(model.classes_).index(1)
+
+    encabezado = pd.read_csv(entrada, nrows=0).columns
+    for col in columnas_utiles + list(conservar):
+        if col not in encabezado:
+            raise ValueError(f"La columna '{col}' no está en el archivo CSV.")
+
+    # Los numéricos se leen como float32: las exportaciones diarias pueden traer
+    # nulos también en columnas que en el dataset de entrenamiento son enteras.
+    tipos = {col: ("category" if tipos_columnas[col] == "category" else "float32")
+             for col in columnas_utiles}
+    lector = pd.read_csv(entrada, usecols=columnas_utiles + list(conservar),
+                         dtype=tipos, chunksize=chunksize)
+
+    filas = 0
+    with open(salida, "w", encoding="utf-8", newline="") as f:
+        for i, bloque in enumerate(lector):
+            if monitor is not None:
+                monitor.actualizar(bloque)
+            X = codificador.transformar(bloque[columnas_utiles])[columnas_modelo]
+            proba = model.predict_proba(X)[:, indice_positivo]
+
+            resultado = bloque[list(conservar)].copy()
+            resultado["prediccion"] = np.where(proba >= 0.5, "satisfied", "dissatisfied")
+            resultado["probabilidad_satisfecho"] = proba.round(4)
+            resultado.to_csv(f, header=(i == 0), index=False)
+            filas += len(bloque)
+    return filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Puntúa un CSV de pasajeros con un modelo guardado.")
+    parser.add_argument("entrada", help="CSV de entrada con las columnas útiles")
+    parser.add_argument("salida", help="CSV de salida con predicciones y probabilidades")
+    parser.add_argument("--modelo", type=int, default=None, help="Id del modelo (por defecto, el actual)")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="Filas por bloque")
+    parser.add_argument("--conservar", nargs="*", default=[],
+                        help="Columnas del CSV de entrada a copiar en la salida (p. ej. un id)")
+    parser.add_argument("--monitor", action="store_true",
+                        help="Compara los datos con el perfil de entrenamiento del modelo (deriva y calidad)")
+    args = parser.parse_args()
+
+    monitor = None
+    if args.monitor:
+        modelo_id = args.modelo if args.modelo is not None else registro_modelos.modelo_actual_id()
+        monitor = monitor_deriva.AcumuladorDeriva(monitor_deriva.perfil_del_modelo(modelo_id))
+
+    inicio = time.perf_counter()
+    filas = puntuar_csv(args.entrada, args.salida, args.modelo, args.chunksize, args.conservar, monitor)
+    duracion = time.perf_counter() - inicio
+    print(f"✅ {filas} filas puntuadas en {duracion:.1f} s ({filas / max(duracion, 1e-9):,.0f} filas/s) -> {args.salida}")
+    if monitor is not None:
+        monitor_deriva.imprimir_informe(monitor.informe(), filas)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# registro_modelos.py
+import os
+import json
+import argparse
+from functools import lru_cache
+
+import pandas as pd
+
+from utils_model import entrenar_modelo, cargar_config, hiperparametros
+from almacen_modelos import (DIR_MODELOS, FORMATOS, ruta_modelo, ruta_encoder, listar_modelos,
+                             leer_metadatos, reservar_id, liberar_id, cargar_modelo, aplicar_retencion)
+from datos import cargar_dataset, hashes_filas, huella_filas, columnas_utiles
+from codificador import CodificadorCategorico
+from bosque_plano import BosquePlano, ruta_plano
+from instrumentacion import medir, contar, perfil_desde_entorno
+
+ARCHIVO_ACTUAL = os.path.join(DIR_MODELOS, "actual.json")
+
+
+@lru_cache(maxsize=1)
+def _leer_actual(mtime_ns):
+    # Como en _cargar_en_cache, la mtime forma parte de la clave: si otro
+    # proceso cambia actual.json, se vuelve a leer.
+    with open(ARCHIVO_ACTUAL, encoding="utf-8") as f:
+        return json.load(f)["modelo_id"]
+
+
+def modelo_actual_id():
+    """Id del modelo marcado como actual, o None si no hay ninguno."""
+    try:
+        mtime_ns = os.stat(ARCHIVO_ACTUAL).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _leer_actual(mtime_ns)
+
+
+def establecer_actual(modelo_id):
+    if not os.path.exists(ruta_modelo(modelo_id)):
+        raise ValueError(f"El modelo {modelo_id} no existe.")
+    os.makedirs(DIR_MODELOS, exist_ok=True)
+    tmp = ARCHIVO_ACTUAL + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"modelo_id": modelo_id}, f)
+    os.replace(tmp, ARCHIVO_ACTUAL)
+
+
+def buscar_entrenamiento_previo(hashes, hp):
+    """Busca modelos reutilizables para un dataset dado por sus hashes de fila.
+
+    Devuelve (igual, base): el id de un modelo entrenado exactamente con estos
+    datos e hiperparámetros hp, y los metadatos del modelo más reciente entrenado
+    con un prefijo estricto de ellos (el dataset solo ha crecido por el final).
+    """
+    huella = huella_filas(hashes)
+    igual, base = None, None
+    for modelo_id in listar_modelos():
+        meta = leer_metadatos(modelo_id)
+        # Los miembros de construir_ensamble se entrenaron con un fragmento de los datos
+        if meta is None or meta.get("hiperparametros") != hp or meta.get("modo") == "ensamble":
+            continue
+        if meta["huella_dataset"] == huella:
+            igual = modelo_id
+        elif meta["filas"] < len(hashes) and meta["huella_dataset"] == huella_filas(hashes, meta["filas"]):
+            base = meta
+    return igual, base
+
+
+def entrenar(csv_path, establecer_como_actual=True, progreso=None, cancelar=None, incremental=False,
+             config=None):
+    """Entrena un modelo nuevo (solo bajo petición explícita) y devuelve su id.
+
+    Con incremental=True no se entrena si ya existe un modelo con la misma
+    huella de datos (se devuelve ese id), y si el dataset solo ha crecido se
+    amplía el último modelo con árboles entrenados sobre las filas añadidas.
+    config: configuración de entrenamiento (ver utils_model.cargar_config).
+    """
+    if config is None:
+        config = cargar_config()
+    base = None
+    if incremental:
+        igual, base = buscar_entrenamiento_previo(hashes_filas(cargar_dataset(csv_path)),
+                                                  hiperparametros(config))
+        if igual is not None:
+            if establecer_como_actual:
+                establecer_actual(igual)
+            return igual
+
+    modelo_id = reservar_id()
+    try:
+        entrenar_modelo(csv_path, modelo_id, progreso=progreso, cancelar=cancelar, base=base, config=config)
+    finally:
+        liberar_id(modelo_id)
+    if establecer_como_actual:
+        establecer_actual(modelo_id)
+
+    borrados = aplicar_retencion(config["retener_ultimos"], config["retener_mejores"],
+                                 conservar=(modelo_id, modelo_actual_id()))
+    if borrados:
+        limpiar_cache()
+        print(f"🗑️ Modelos eliminados por la política de retención: {borrados}")
+    return modelo_id
+
+
+@lru_cache(maxsize=4)
+def _cargar_en_cache(modelo_id, mtime_modelo, mtime_encoder):
+    # Las mtimes forman parte de la clave: si el archivo cambia en disco,
+    # la entrada anterior deja de usarse y se recarga.
+    contar("cache_modelo_fallos")
+    with medir("cargar_modelo", modelo_id=modelo_id):
+        model = cargar_modelo(modelo_id)
+        codificador = CodificadorCategorico.cargar(ruta_encoder(modelo_id))
+    return model, codificador
+
+
+def cargar(modelo_id=None):
+    """Devuelve (model, codificador) del modelo indicado (o del actual) desde la caché."""
+    if modelo_id is None:
+        modelo_id = modelo_actual_id()
+        if modelo_id is None:
+            raise ValueError("No hay un modelo actual. Entrene un modelo primero.")
+    return _cargar_en_cache(modelo_id,
+                            os.stat(ruta_modelo(modelo_id)).st_mtime_ns,
+                            os.stat(ruta_encoder(modelo_id)).st_mtime_ns)
+
+
+@lru_cache(maxsize=4)
+def _plano_en_cache(modelo_id, mtime_modelo):
+    directorio = ruta_plano(modelo_id)
+    meta_plano = os.path.join(directorio, "meta.json")
+    if os.path.exists(meta_plano) and os.stat(meta_plano).st_mtime_ns >= mtime_modelo:
+        with medir("cargar_plano", modelo_id=modelo_id):
+            return BosquePlano.cargar(directorio)
+    model, _ = cargar(modelo_id)
+    with medir("exportar_plano", modelo_id=modelo_id):
+        plano = BosquePlano.desde_modelo(model)
+        plano.guardar(directorio)
+    return plano
+
+
+def cargar_plano(modelo_id=None):
+    """Bosque aplanado del modelo (exportado a disco la primera vez que se pide)."""
+    if modelo_id is None:
+        modelo_id = modelo_actual_id()
+    return _plano_en_cache(modelo_id, os.stat(ruta_modelo(modelo_id)).st_mtime_ns)
+
+
+def limpiar_cache():
+    _cargar_en_cache.cache_clear()
+    _plano_en_cache.cache_clear()
+
+
+def predecir(entrada, modelo_id=None, plano=True):
+    """Predice una fila (dict columna -> valor). Devuelve (pred, proba_satisfecho, modelo_id).
+
+    Con plano=True se usa el bosque aplanado (mismo resultado que
+    predict_proba, sin el coste fijo de sklearn para una sola fila).
+    """
+    if modelo_id is None:
+        modelo_id = modelo_actual_id()
+    model, codificador = cargar(modelo_id)
+
+    if plano:
+        bosque = cargar_plano(modelo_id)
+        with medir("predecir", modelo_id=modelo_id, plano=True):
+            proba = bosque.predecir_proba(bosque.vector_fila(entrada, codificador))[0]
+    else:
+        with medir("codificar", modelo_id=modelo_id):
+            df_input = codificador.transformar(pd.DataFrame([entrada], columns=columnas_utiles))
+            df_input = df_input[model.feature_names_in_]
+        with medir("predecir", modelo_id=modelo_id, plano=False):
+            proba = model.predict_proba(df_input)[0]
+    pred = int(model.classes_[proba.argmax()])
+    return pred, float(proba[list(model.classes_).index(1)]), modelo_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entrena un modelo y lo marca como actual.")
+    parser.add_argument("--csv", default="data/Airline_customer_satisfaction.csv")
+    parser.add_argument("--config", default="config_entrenamiento.json", help="Archivo JSON de configuración")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reutiliza o amplía un modelo previo si los datos no cambiaron o solo crecieron")
+    parser.add_argument("--n-jobs", type=int)
+    parser.add_argument("--n-estimators", type=int)
+    parser.add_argument("--max-samples", type=float, help="Fracción de filas por árbol (bootstrap)")
+    parser.add_argument("--max-depth", type=int)
+    parser.add_argument("--min-samples-leaf", type=int)
+    parser.add_argument("--formato", choices=FORMATOS, help="Formato del archivo del modelo")
+    parser.add_argument("--retener-ultimos", type=int, help="Conserva solo los N modelos más recientes")
+    parser.add_argument("--retener-mejores", type=int, help="Conserva además los K mejores por AUC de validación")
+    args = parser.parse_args()
+    perfil_desde_entorno("entrenamiento")
+
+    config = cargar_config(args.config, n_jobs=args.n_jobs, n_estimators=args.n_estimators,
+                           max_samples=args.max_samples, max_depth=args.max_depth,
+                           min_samples_leaf=args.min_samples_leaf, formato_modelo=args.formato,
+                           retener_ultimos=args.retener_ultimos, retener_mejores=args.retener_mejores)
+    modelo_id = entrenar(args.csv, incremental=args.incremental, config=config)
+    meta = leer_metadatos(modelo_id) or {}
+    if "metricas" in meta:
+        metricas = meta["metricas"]
+        print(f"🌲 Modelo {modelo_id} ({meta['modo']}): {meta['n_arboles']} árboles en {metricas['segundos']} s, "
+              f"memoria al empezar {metricas.get('memoria_inicio_mb')} MB, "
+              f"pico {metricas.get('memoria_pico_mb')} MB")
+    print(f"✅ Modelo actual: {modelo_id}")
+
+
+if __name__ == "__main__":
+    main()
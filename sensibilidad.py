@@ -0,0 +1,196 @@
+# sensibilidad.py
+import json
+import argparse
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from datos import columnas_utiles
+from instrumentacion import medir
+
+# Valores que se prueban por defecto para cada característica
+VALORES_POR_DEFECTO = {
+    "Age": [18, 25, 35, 45, 55, 65, 75],
+    "Flight Distance": [250, 500, 1000, 2000, 3000, 4500, 6000],
+    "Inflight entertainment": [0, 1, 2, 3, 4, 5],
+    "On-board service": [0, 1, 2, 3, 4, 5],
+    "Cleanliness": [0, 1, 2, 3, 4, 5],
+    "Arrival Delay in Minutes": [0, 5, 15, 30, 60, 120, 180],
+    "Departure Delay in Minutes": [0, 5, 15, 30, 60, 120, 180],
+}
+
+# Fila de ejemplo (los mismos valores iniciales que el formulario de la interfaz)
+FILA_EJEMPLO = {
+    "Age": 35,
+    "Type of Travel": "Personal Travel",
+    "Class": "Eco",
+    "Flight Distance": 1000,
+    "Inflight entertainment": 3,
+    "On-board service": 3,
+    "Cleanliness": 3,
+    "Arrival Delay in Minutes": 15,
+    "Departure Delay in Minutes": 10,
+}
+
+
+def rejilla(entrada, variaciones):
+    """DataFrame con una fila por combinación de valores de las características a variar.
+
+    variaciones: dict columna -> lista de valores. El resto de columnas
+    conserva el valor de `entrada`.
+    """
+    desconocidas = set(variaciones) - set(columnas_utiles)
+    if desconocidas:
+        raise ValueError(f"Columnas desconocidas: {sorted(desconocidas)}")
+    faltantes = set(columnas_utiles) - set(entrada)
+    if faltantes:
+        raise ValueError(f"Faltan columnas en la fila: {sorted(faltantes)}")
+
+    columnas = list(variaciones)
+    combinaciones = list(itertools.product(*(variaciones[col] for col in columnas)))
+    df = pd.DataFrame([entrada] * len(combinaciones), columns=columnas_utiles)
+    for i, col in enumerate(columnas):
+        df[col] = [combinacion[i] for combinacion in combinaciones]
+    return df
+
+
+def _valores(columna, codificador):
+    if columna in VALORES_POR_DEFECTO:
+        return VALORES_POR_DEFECTO[columna]
+    if columna in codificador.clases:
+        return codificador.clases[columna]
+    raise ValueError(f"No hay valores por defecto para '{columna}': indíquelos con --valores")
+
+
+def analizar(entrada, variaciones, modelo_id=None, usar_ensamble=False):
+    """Probabilidad de satisfacción en toda la rejilla de perturbaciones de una fila.
+
+    Toda la rejilla (más la fila original, en la primera posición) se puntúa
+    con una única llamada vectorizada a predict_proba. variaciones puede ser
+    una lista de columnas o un dict columna -> valores; las columnas sin
+    valores (o con None) usan VALORES_POR_DEFECTO o, si son categóricas,
+    todas las categorías conocidas por el encoder. Devuelve (proba_base,
+    tabla): tabla tiene las columnas variadas, "probabilidad" y "delta"
+    respecto a la fila original.
+    """
+    if usar_ensamble:
+        import ensamble
+        ens = ensamble.ensamble_registro()
+        codificador = ens.miembros[0][2]
+    else:
+        import registro_modelos
+        model, codificador = registro_modelos.cargar(modelo_id)
+    if not isinstance(variaciones, dict):
+        variaciones = dict.fromkeys(variaciones)
+    variaciones = {col: valores if valores is not None else _valores(col, codificador)
+                   for col, valores in variaciones.items()}
+
+    df = rejilla(entrada, variaciones)
+    X = pd.concat([pd.DataFrame([entrada], columns=columnas_utiles), df], ignore_index=True)
+    with medir("sensibilidad_puntuar", filas=len(X), ensamble=usar_ensamble):
+        if usar_ensamble:
+            probas = ens.predecir_proba(X)
+        else:
+            X = codificador.transformar(X)[model.feature_names_in_]
+            probas = model.predict_proba(X)[:, list(model.classes_).index(1)]
+
+    proba_base = float(probas[0])
+    tabla = df[list(variaciones)].copy()
+    tabla["probabilidad"] = probas[1:]
+    tabla["delta"] = probas[1:] - proba_base
+    return proba_base, tabla
+
+
+def matriz_deltas(tabla):
+    """Tabla de deltas con la primera columna variada en filas y la segunda en columnas."""
+    columnas = [c for c in tabla.columns if c not in ("probabilidad", "delta")]
+    if len(columnas) != 2:
+        raise ValueError("La matriz de deltas necesita exactamente dos características variadas.")
+    return tabla.pivot_table(index=columnas[0], columns=columnas[1], values="delta", sort=False)
+
+
+def graficar(matriz, proba_base, ruta=None):
+    """Mapa de calor de los deltas; se guarda como PNG si se indica ruta."""
+    import matplotlib
+    if ruta:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    limite = max(float(np.abs(matriz.to_numpy()).max()), 1e-6)
+    fig, ax = plt.subplots()
+    imagen = ax.imshow(matriz.to_numpy(), cmap="RdYlGn", vmin=-limite, vmax=limite, aspect="auto")
+    ax.set_xticks(range(len(matriz.columns)), [str(c) for c in matriz.columns])
+    ax.set_yticks(range(len(matriz.index)), [str(i) for i in matriz.index])
+    ax.set_xlabel(matriz.columns.name)
+    ax.set_ylabel(matriz.index.name)
+    ax.set_title(f"Cambio en P(satisfecho) respecto a {proba_base:.2f}")
+    fig.colorbar(imagen, ax=ax)
+    if ruta:
+        fig.savefig(ruta, bbox_inches="tight")
+        plt.close(fig)
+        print(f"🖼️ Mapa de calor guardado en {ruta}")
+    else:
+        plt.show()
+
+
+def _leer_valores(textos):
+    """["col=v1,v2", ...] -> dict columna -> lista de valores (números si se puede)."""
+    variaciones = {}
+    for texto in textos:
+        col, _, valores = texto.partition("=")
+        variaciones[col] = [_numero(v) for v in valores.split(",")]
+    return variaciones
+
+
+def _numero(valor):
+    try:
+        return int(valor)
+    except ValueError:
+        try:
+            return float(valor)
+        except ValueError:
+            return valor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Análisis de sensibilidad (qué pasaría si) para un pasajero.")
+    parser.add_argument("--fila", help="Fila del pasajero en JSON, o ruta a un archivo JSON")
+    parser.add_argument("--variar", nargs="+", default=["Cleanliness", "Departure Delay in Minutes"],
+                        help="Características a variar con sus valores por defecto")
+    parser.add_argument("--valores", nargs="+", default=[], metavar="COL=V1,V2",
+                        help="Valores explícitos para una característica (sustituye a --variar para esa columna)")
+    parser.add_argument("--modelo", type=int, default=None, help="Id del modelo (por defecto, el actual)")
+    parser.add_argument("--ensamble", action="store_true", help="Puntúa con el ensamble de todos los modelos")
+    parser.add_argument("--salida-csv", help="Guarda la tabla completa en CSV")
+    parser.add_argument("--mapa-calor", help="Guarda el mapa de calor (dos características) en este PNG")
+    args = parser.parse_args()
+
+    entrada = dict(FILA_EJEMPLO)
+    if args.fila:
+        if args.fila.lstrip().startswith("{"):
+            entrada.update(json.loads(args.fila))
+        else:
+            with open(args.fila, encoding="utf-8") as f:
+                entrada.update(json.load(f))
+
+    explicitas = _leer_valores(args.valores)
+    variaciones = {col: explicitas.get(col) for col in args.variar}
+    variaciones.update(explicitas)
+
+    proba_base, tabla = analizar(entrada, variaciones, args.modelo, args.ensamble)
+    print(f"🎯 P(satisfecho) de la fila original: {proba_base:.4f} ({len(tabla)} combinaciones)")
+    if len(variaciones) == 2:
+        matriz = matriz_deltas(tabla)
+        print(matriz.map(lambda d: f"{d:+.3f}").to_string())
+        if args.mapa_calor:
+            graficar(matriz, proba_base, args.mapa_calor)
+    else:
+        print(tabla.sort_values("delta", ascending=False).head(20).to_string(index=False))
+    if args.salida_csv:
+        tabla.to_csv(args.salida_csv, index=False)
+        print(f"✅ Tabla completa en {args.salida_csv}")
+
+
+if __name__ == "__main__":
+    main()
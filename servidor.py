@@ -0,0 +1,226 @@
+# servidor.py
+import json
+import time
+import queue
+import argparse
+import threading
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+import registro_modelos
+from datos import columnas_utiles, tipos_columnas
+
+columnas_categoricas = [col for col in columnas_utiles if tipos_columnas[col] == "category"]
+
+
+class ErrorEntrada(ValueError):
+    """Petición con campos ausentes o de tipo incorrecto (se responde con 400)."""
+
+
+def validar_fila(fila):
+    if not isinstance(fila, dict):
+        raise ErrorEntrada("Cada fila debe ser un objeto JSON.")
+    faltan = [col for col in columnas_utiles if col not in fila]
+    if faltan:
+        raise ErrorEntrada(f"Faltan campos: {faltan}")
+    for col in columnas_utiles:
+        valor = fila[col]
+        if col in columnas_categoricas:
+            if not isinstance(valor, str):
+                raise ErrorEntrada(f"El campo '{col}' debe ser texto.")
+        elif valor is not None and (isinstance(valor, bool) or not isinstance(valor, (int, float))):
+            raise ErrorEntrada(f"El campo '{col}' debe ser numérico.")
+    return {col: fila[col] for col in columnas_utiles}
+
+
+def puntuar_filas(filas, modelo_id=None):
+    """Puntúa una lista de filas validadas con una sola llamada a predict_proba."""
+    model, codificador = registro_modelos.cargar(modelo_id)
+    X = pd.DataFrame(filas, columns=columnas_utiles)
+    for col in columnas_utiles:
+        if col not in columnas_categoricas:
+            X[col] = X[col].astype(np.float32)
+    X = codificador.transformar(X)[model.feature_names_in_]
+    proba = model.predict_proba(X)[:, list(model.classes_).index(1)]
+    modelo_id = modelo_id if modelo_id is not None else registro_modelos.modelo_actual_id()
+    return [{"prediccion": "satisfied" if p >= 0.5 else "dissatisfied",
+             "probabilidad_satisfecho": round(float(p), 4),
+             "modelo_id": modelo_id} for p in proba]
+
+
+class MicroLote:
+    """Agrupa peticiones individuales concurrentes en lotes pequeños.
+
+    El primer elemento que llega abre una ventana de `ventana_ms`; todo lo que
+    entra en ella (hasta `max_lote`) se puntúa junto en un único predict_proba.
+    """
+
+    def __init__(self, modelo_id=None, ventana_ms=5, max_lote=64):
+        self.modelo_id = modelo_id
+        self.ventana = ventana_ms / 1000
+        self.max_lote = max_lote
+        self.cola = queue.Queue()
+        self.lotes = 0
+        self.filas = 0
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def enviar(self, fila):
+        futuro = Future()
+        self.cola.put((fila, futuro))
+        return futuro
+
+    def _bucle(self):
+        while True:
+            pendientes = [self.cola.get()]
+            limite = time.perf_counter() + self.ventana
+            while len(pendientes) < self.max_lote:
+                restante = limite - time.perf_counter()
+                if restante <= 0:
+                    break
+                try:
+                    pendientes.append(self.cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+
+            try:
+                resultados = puntuar_filas([fila for fila, _ in pendientes], self.modelo_id)
+            except Exception as e:
+                for _, futuro in pendientes:
+                    futuro.set_exception(e)
+                continue
+            self.lotes += 1
+            self.filas += len(pendientes)
+            for (_, futuro), resultado in zip(pendientes, resultados):
+                futuro.set_result(resultado)
+
+
+class ManejadorPrediccion(BaseHTTPRequestHandler):
+    micro_lote = None  # se asigna en crear_servidor
+
+    def _responder(self, estado, cuerpo):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _leer_json(self):
+        try:
+            longitud = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            raise ErrorEntrada("La cabecera Content-Length no es un número.")
+        if longitud < 0:
+            # rfile.read(-1) esperaría a que el cliente cierre la conexión
+            raise ErrorEntrada("La cabecera Content-Length no puede ser negativa.")
+        try:
+            return json.loads(self.rfile.read(longitud) or b"null")
+        except ValueError:
+            raise ErrorEntrada("El cuerpo no es JSON válido.")
+
+    def do_GET(self):
+        try:
+            if self.path == "/salud":
+                self._responder(200, {"estado": "ok", "modelo_id": registro_modelos.modelo_actual_id(),
+                                      "lotes": self.micro_lote.lotes, "filas": self.micro_lote.filas})
+            elif self.path == "/esquema":
+                _, codificador = registro_modelos.cargar(self.micro_lote.modelo_id)
+                self._responder(200, {"columnas": columnas_utiles, "categorias": codificador.clases})
+            else:
+                self._responder(404, {"error": "Ruta no encontrada."})
+        except Exception as e:
+            self._responder(500, {"error": str(e)})
+
+    def do_POST(self):
+        try:
+            if self.path == "/predecir":
+                fila = validar_fila(self._leer_json())
+                self._responder(200, self.micro_lote.enviar(fila).result())
+            elif self.path == "/predecir_lote":
+                cuerpo = self._leer_json()
+                if not isinstance(cuerpo, dict) or not isinstance(cuerpo.get("filas"), list):
+                    raise ErrorEntrada("Se esperaba un objeto con la lista 'filas'.")
+                filas = [validar_fila(fila) for fila in cuerpo["filas"]]
+                resultados = puntuar_filas(filas, self.micro_lote.modelo_id) if filas else []
+                self._responder(200, {"resultados": resultados})
+            else:
+                self._responder(404, {"error": "Ruta no encontrada."})
+        except ErrorEntrada as e:
+            self._responder(400, {"error": str(e)})
+        except Exception as e:
+            self._responder(500, {"error": str(e)})
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def crear_servidor(host="127.0.0.1", puerto=8000, modelo_id=None, ventana_ms=5, max_lote=64):
+    """Crea el servidor HTTP (sin arrancarlo) con el modelo ya cargado en memoria."""
+    registro_modelos.cargar(modelo_id)
+    manejador = type("Manejador", (ManejadorPrediccion,),
+                     {"micro_lote": MicroLote(modelo_id, ventana_ms, max_lote)})
+    return ThreadingHTTPServer((host, puerto), manejador)
+
+
+def _post(url, cuerpo):
+    peticion = urllib.request.Request(url, data=json.dumps(cuerpo).encode("utf-8"),
+                                      headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(peticion) as respuesta:
+        return json.loads(respuesta.read())
+
+
+def prueba_local(n_peticiones=200, concurrencia=16):
+    """Arranca el servidor en un puerto libre, lanza peticiones concurrentes y lo detiene."""
+    servidor = crear_servidor(puerto=0)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{servidor.server_address[1]}"
+
+    fila = {"Age": 35, "Type of Travel": "Personal Travel", "Class": "Eco", "Flight Distance": 1000,
+            "Inflight entertainment": 3, "On-board service": 3, "Cleanliness": 3,
+            "Arrival Delay in Minutes": 15, "Departure Delay in Minutes": 10}
+    try:
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(concurrencia) as pool:
+            respuestas = list(pool.map(lambda _: _post(url + "/predecir", fila), range(n_peticiones)))
+        duracion = time.perf_counter() - inicio
+        lote = _post(url + "/predecir_lote", {"filas": [fila] * 10})
+        micro = servidor.RequestHandlerClass.micro_lote
+        print(f"✅ {len(respuestas)} peticiones en {duracion:.2f} s -> {respuestas[0]}")
+        print(f"📦 {micro.lotes} lotes (media {micro.filas / max(micro.lotes, 1):.1f} filas por lote)")
+        print(f"📦 /predecir_lote: {len(lote['resultados'])} resultados")
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor HTTP de predicción de satisfacción.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8000)
+    parser.add_argument("--modelo", type=int, default=None, help="Id del modelo (por defecto, el actual)")
+    parser.add_argument("--ventana-ms", type=float, default=5, help="Ventana de agrupación de peticiones")
+    parser.add_argument("--max-lote", type=int, default=64)
+    parser.add_argument("--prueba", action="store_true", help="Ejecuta una prueba local con peticiones concurrentes")
+    args = parser.parse_args()
+
+    if args.prueba:
+        prueba_local()
+        return
+
+    servidor = crear_servidor(args.host, args.puerto, args.modelo, args.ventana_ms, args.max_lote)
+    print(f"🚀 Servidor de predicción en http://{args.host}:{args.puerto}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
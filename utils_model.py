@@ -1,38 +1,193 @@
 # utils_model.py
-import pandas as pd
 import joblib
+import json
 import os
+import time
+import warnings
+import numpy as np
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder
+from sklearn.metrics import roc_auc_score
+import almacen_modelos
+from datos import cargar_dataset, etiquetas, columnas_utiles, hashes_filas, huella_filas
+from codificador import CodificadorCategorico
+from instrumentacion import medir, registrar, rss_actual_mb, memoria_pico
+from monitor_deriva import perfil_referencia
 
-def entrenar_modelo(csv_path, modelo_id):
-    df = pd.read_csv(csv_path)
+RUTA_CONFIG = "config_entrenamiento.json"
 
-    columnas_utiles = ["Age", "Type of Travel", "Class",
-                       "Flight Distance", "Inflight entertainment",
-                       "On-board service", "Cleanliness",
-                       "Arrival Delay in Minutes", "Departure Delay in Minutes"]
+# n_jobs=-1 usa todos los núcleos; max_samples < 1.0 entrena cada árbol con
+# una submuestra bootstrap; float32 evita la copia a float64 del DataFrame.
+CONFIG_POR_DEFECTO = {
+    "n_estimators": 100,
+    "random_state": 42,
+    "n_jobs": -1,
+    "max_samples": None,
+    "max_depth": None,
+    "min_samples_leaf": 1,
+    "float32": True,
+    "formato_modelo": "comprimido",
+    "validacion_oob": True,
+    "retener_ultimos": None,
+    "retener_mejores": None,
+}
 
-    for col in columnas_utiles:
-        if col not in df.columns:
-            raise ValueError(f"La columna '{col}' no está en el archivo CSV.")
+# Claves de la configuración que cambian el modelo resultante
+CLAVES_MODELO = ("n_estimators", "random_state", "max_samples", "max_depth", "min_samples_leaf")
 
-    X = df[columnas_utiles]
-    y = df["satisfaction"].apply(lambda x: 1 if x == "satisfied" else 0)
+class EntrenamientoCancelado(Exception):
+    """Se lanza cuando un entrenamiento se cancela antes de terminar."""
 
-    label_encoders = {}
-    for col in X.select_dtypes(include='object').columns:
-        le = LabelEncoder()
-        X[col] = le.fit_transform(X[col])
-        label_encoders[col] = le
+def cargar_config(ruta=RUTA_CONFIG, **cambios):
+    """Configuración de entrenamiento: valores por defecto < archivo JSON < argumentos."""
+    config = dict(CONFIG_POR_DEFECTO)
+    if ruta and os.path.exists(ruta):
+        with open(ruta, encoding="utf-8") as f:
+            config.update(json.load(f))
+    config.update({k: v for k, v in cambios.items() if v is not None})
 
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
-    model.fit(X, y)
+    desconocidas = set(config) - set(CONFIG_POR_DEFECTO)
+    if desconocidas:
+        raise ValueError(f"Claves de configuración desconocidas: {sorted(desconocidas)}")
+    # Antes de entrenar: una retención de 0 modelos lo borraría todo
+    almacen_modelos.validar_retencion(config["retener_ultimos"], config["retener_mejores"])
+    return config
+
+def hiperparametros(config):
+    return {k: config[k] for k in CLAVES_MODELO}
+
+def _crecer_bosque(model, X, y, n_objetivo, progreso, cancelar, paso_arboles, oob=False):
+    # El bosque crece por tandas con warm_start (mismo resultado que un único
+    # fit con la misma semilla) para poder informar el avance y cancelar.
+    inicial = len(getattr(model, "estimators_", []))
+    model.set_params(warm_start=True, n_estimators=inicial)
+    while model.n_estimators < n_objetivo:
+        if cancelar is not None and cancelar.is_set():
+            raise EntrenamientoCancelado("Entrenamiento cancelado por el usuario.")
+        model.set_params(n_estimators=min(model.n_estimators + paso_arboles, n_objetivo))
+        # La estimación out-of-bag se calcula una sola vez, en la última tanda
+        model.set_params(oob_score=oob and model.n_estimators == n_objetivo)
+        model.fit(X, y)
+        if progreso is not None:
+            progreso(model.n_estimators - inicial, n_objetivo - inicial)
+    model.set_params(warm_start=False, oob_score=False)
+
+def entrenar_modelo(csv_path, modelo_id, progreso=None, cancelar=None, paso_arboles=10, base=None,
+                    config=None):
+    """Entrena y guarda el modelo, sus encoders y sus metadatos.
+
+    progreso: función opcional progreso(arboles_construidos, arboles_totales).
+    cancelar: threading.Event opcional; si se activa, se lanza
+    EntrenamientoCancelado y no se guarda nada.
+    base: metadatos de un modelo previo entrenado con un prefijo de este mismo
+    dataset. Si se indica, se parte de ese modelo y solo se añaden árboles
+    entrenados con las filas nuevas; si no es posible (clases o categorías
+    nuevas), se entrena desde cero.
+    config: configuración de entrenamiento (ver cargar_config); por defecto
+    la del archivo config_entrenamiento.json si existe.
+
+    Devuelve los metadatos guardados, con el tiempo, la memoria residente al
+    empezar y el pico de memoria durante el entrenamiento (sin el guardado).
+    """
+    if config is None:
+        config = cargar_config()
+    hp = hiperparametros(config)
+    tipo_x = np.float32 if config["float32"] else None
+    # Con warm_start cada tanda se reparte entre los núcleos: que al menos haya
+    # un árbol por núcleo para no desaprovecharlos.
+    paso_arboles = max(paso_arboles, joblib.effective_n_jobs(config["n_jobs"]))
+    inicio = time.perf_counter()
+    rss_inicio = rss_actual_mb()
+
+    # Pico de memoria de este entrenamiento (no el de toda la vida del proceso)
+    with memoria_pico() as memoria:
+        # Valida las columnas y usa la caché columnar (sin parsear el CSV si no cambió)
+        with medir("cargar_dataset", modelo_id=modelo_id):
+            df = cargar_dataset(csv_path)
+            hashes = hashes_filas(df)
+            y = etiquetas(df)
+
+        # Perfil de referencia para el monitor de deriva (se guarda en los metadatos)
+        with medir("perfil_datos", modelo_id=modelo_id):
+            perfil = perfil_referencia(df)
+        for col, p in perfil["columnas"].items():
+            if p["nulos"] > 0:
+                warnings.warn(f"'{col}' tiene {p['nulos']:.2%} de nulos en los datos de entrenamiento",
+                              stacklevel=2)
+
+        model = None
+        if base is not None:
+            with medir("codificar", modelo_id=modelo_id, filas=len(df) - base["filas"]):
+                codificador = CodificadorCategorico.cargar(almacen_modelos.ruta_encoder(base["modelo_id"]))
+                nuevas = df.iloc[base["filas"]:]
+                y_nuevas = y.iloc[base["filas"]:]
+                X_nuevas = codificador.transformar(nuevas[columnas_utiles])
+            with medir("cargar_modelo_base", modelo_id=base["modelo_id"]):
+                model = almacen_modelos.cargar_modelo(base["modelo_id"])
+            model.set_params(n_jobs=config["n_jobs"])
+            categorias_conocidas = all((X_nuevas[col] >= 0).all() for col in codificador.columnas)
+            if categorias_conocidas and set(y_nuevas.unique()) == set(model.classes_):
+                n_previos = len(model.estimators_)
+                n_nuevos = max(1, round(hp["n_estimators"] * len(nuevas) / base["filas"]))
+                if tipo_x is not None:
+                    X_nuevas = X_nuevas.astype(tipo_x)
+                with medir("entrenar", modelo_id=modelo_id, modo="incremental", arboles=n_nuevos):
+                    _crecer_bosque(model, X_nuevas, y_nuevas, n_previos + n_nuevos, progreso, cancelar, paso_arboles)
+                modo = "incremental"
+            else:
+                model = None
+
+        if model is None:
+            with medir("codificar", modelo_id=modelo_id, filas=len(df)):
+                codificador = CodificadorCategorico.ajustar(df[columnas_utiles])
+                X = codificador.transformar(df[columnas_utiles])
+                if tipo_x is not None:
+                    X = X.astype(tipo_x)
+            model = RandomForestClassifier(n_jobs=config["n_jobs"], **hp)
+            with medir("entrenar", modelo_id=modelo_id, modo="completo", arboles=hp["n_estimators"]):
+                _crecer_bosque(model, X, y, hp["n_estimators"], progreso, cancelar, paso_arboles,
+                               oob=config["validacion_oob"])
+            modo = "completo"
+
+        # AUC de validación out-of-bag (solo en entrenamientos completos): cada fila
+        # se puntúa con los árboles que no la vieron. Se descartan los arrays OOB
+        # para no guardarlos dentro del modelo.
+        auc_validacion = None
+        if hasattr(model, "oob_decision_function_"):
+            proba_oob = model.oob_decision_function_[:, list(model.classes_).index(1)]
+            validas = ~np.isnan(proba_oob)
+            auc_validacion = round(float(roc_auc_score(y.to_numpy()[validas], proba_oob[validas])), 4)
+            del model.oob_decision_function_, model.oob_score_
+        pico_mb = memoria.pico_mb()
 
     os.makedirs("models", exist_ok=True)
     os.makedirs("encoders", exist_ok=True)
 
-    joblib.dump(model, f"models/model_{modelo_id}.pkl")
-    joblib.dump(label_encoders, f"encoders/encoder_{modelo_id}.pkl")
+    segundos = time.perf_counter() - inicio
+
+    metadatos = {
+        "modelo_id": modelo_id,
+        "modo": modo,
+        "base": base["modelo_id"] if modo == "incremental" else None,
+        "huella_dataset": huella_filas(hashes),
+        "filas": len(df),
+        "hiperparametros": hp,
+        "n_arboles": len(model.estimators_),
+        "auc_validacion": auc_validacion,
+        "formato": config["formato_modelo"],
+        "perfil_datos": perfil,
+        "creado": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "metricas": {"segundos": round(segundos, 2), "memoria_inicio_mb": rss_inicio, "memoria_pico_mb": pico_mb,
+                     "n_jobs": joblib.effective_n_jobs(config["n_jobs"])},
+    }
+    # Metadatos y encoder antes que el modelo: un model_{id}.pkl visible
+    # siempre tiene sus acompañantes completos.
+    with medir("guardar", modelo_id=modelo_id, formato=config["formato_modelo"]):
+        almacen_modelos.guardar_metadatos(modelo_id, metadatos)
+        codificador.guardar(f"encoders/encoder_{modelo_id}.json")
+        # n_jobs es un recurso del host que entrena, no parte del modelo guardado
+        model.set_params(n_jobs=None)
+        almacen_modelos.guardar_modelo(model, modelo_id, config["formato_modelo"])
 
-    return True
+    registrar("modelo_entrenado", round(segundos * 1000, 3), modelo_id=modelo_id, modo=modo,
+              arboles=metadatos["n_arboles"], **metadatos["metricas"])
+    return metadatos